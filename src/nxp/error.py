@@ -1,5 +1,6 @@
 
 class MatchError(Exception): pass
+class CutError(MatchError): pass
 
 # ----------  =====  ----------
 
@@ -9,6 +10,7 @@ class PostCheckError(Exception): pass
 # ----------  =====  ----------
 
 class ParseError(Exception): pass 
+class WindowError(Exception): pass
 
 class ScopeError(Exception): 
     def __init__(self,name,msg='Bad Scope'):
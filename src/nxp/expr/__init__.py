@@ -7,3 +7,6 @@ from .compose import *
 from .operation import * # experimental
 from .repeat import *
 from .alias import *
+from .keywords import Keywords
+from .fuse import fuse, Fused
+from .memo import Memo
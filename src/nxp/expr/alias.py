@@ -7,6 +7,7 @@ import re
 from .content import Regex
 from .compose import Set, Seq
 from .repeat import Rep, mulseq
+from .keywords import Keywords
 
 # ------------------------------------------------------------------------
 
@@ -47,6 +48,9 @@ Either = Xor
 def Lit(val, **kwargs):
     return Regex( val, **kwargs )
 
+def Literals(*words, case=True, longest=True):
+    return Keywords( words, case, longest )
+
 def Chars(val, **kwargs):
     return Regex( '[' + val + ']+', **kwargs )
 
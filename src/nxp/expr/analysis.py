@@ -0,0 +1,182 @@
+
+import re
+
+try:
+    from re import _parser as sre_parse, _constants as sre_c
+except ImportError: # Python < 3.11
+    import sre_parse, sre_constants as sre_c
+
+"""
+Static analysis of expressions.
+
+Each token has a FIRST set, i.e. the characters with which a match can
+start, and is nullable if it can match the empty string. FIRST sets are
+frozensets, or None when they cannot be determined (e.g. \\w or negated
+classes), in which case any character is assumed. Nullability is True, 
+False, or None when it cannot be determined (e.g. custom tokens).
+
+Both are over-approximations: a token that is not nullable (False) never
+matches the empty string, and never matches at a character outside of its
+FIRST set, which allows skipping alternatives without attempting to match
+them (see Token.excludes). Conversely, only tokens which are nullable 
+(True) are rejected where matching empty would not terminate (see Rep).
+"""
+
+# largest range of characters expanded in a FIRST set
+MAX_RANGE = 256
+
+# non-ASCII characters matching ASCII letters with re.IGNORECASE
+_fold = { 'i': 'İı', 'k': 'K', 's': 'ſ' }
+
+_repeat = { sre_c.MAX_REPEAT, sre_c.MIN_REPEAT }
+if hasattr(sre_c,'POSSESSIVE_REPEAT'):
+    _repeat.add(sre_c.POSSESSIVE_REPEAT)
+
+# ------------------------------------------------------------------------
+
+def _chars(codes,icase):
+    """
+    Set of characters from code points, or None if case-insensitive
+    matches cannot be enumerated (non-ASCII cased characters).
+    """
+    out = set()
+    for c in codes:
+        c = chr(c)
+        out.add(c)
+        if icase and c.lower() != c.upper():
+            if not c.isascii():
+                return None
+            low = c.lower()
+            out.update(( low, c.upper() ))
+            out.update(_fold.get(low,''))
+    return out
+
+def null_any(ns):
+    """
+    Nullability of a choice between tokens with nullability ns.
+    """
+    out = False
+    for n in ns:
+        if n: return True
+        if n is None: out = None
+    return out
+
+def null_all(ns):
+    """
+    Nullability of a sequence of tokens with nullability ns.
+    """
+    out = True
+    for n in ns:
+        if n is False: return False
+        if n is None: out = None
+    return out
+
+def _union(a,b):
+    if a is None or b is None:
+        return None
+    return a | b
+
+def _class(items,icase):
+    out = set()
+    for op, av in items:
+        if op is sre_c.LITERAL:
+            f = _chars( [av], icase )
+        elif op is sre_c.RANGE and av[1] - av[0] < MAX_RANGE:
+            f = _chars( range(av[0],av[1]+1), icase )
+        else: # categories, negation, large ranges
+            return None
+        if f is None:
+            return None
+        out |= f
+    return out
+
+def _item(op,av,icase):
+    if op is sre_c.LITERAL:
+        return _chars([av],icase), False
+    elif op is sre_c.IN:
+        return _class(av,icase), False
+    elif op in (sre_c.NOT_LITERAL, sre_c.ANY):
+        return None, False
+    elif op is sre_c.BRANCH:
+        first, null = set(), []
+        for sub in av[1]:
+            f, n = _seq(sub,icase)
+            first = _union(first,f)
+            null.append(n)
+        return first, null_any(null)
+    elif op is sre_c.SUBPATTERN:
+        _, on, off, sub = av
+        icase = (icase or bool(on & re.I)) and not off & re.I
+        return _seq(sub,icase)
+    elif op in _repeat:
+        lo, hi, sub = av
+        if hi == 0:
+            return set(), True
+        f, n = _seq(sub,icase)
+        return f, True if lo == 0 else n
+    elif op in (sre_c.AT, sre_c.ASSERT, sre_c.ASSERT_NOT):
+        return set(), True # zero-width
+    elif getattr(sre_c,'ATOMIC_GROUP',None) is op:
+        return _seq(av,icase)
+    else: # backreferences, conditionals
+        return None, None
+
+def _seq(items,icase):
+    first, null = set(), True
+    for op, av in items:
+        f, n = _item(op,av,icase)
+        first = _union(first,f)
+        if n is False:
+            return first, False
+        null = null_all((null,n))
+    return first, null
+
+def analyse_regex(pat):
+    """
+    FIRST set and nullability of compiled regex.
+    """
+    if not isinstance(pat.pattern,str):
+        return None, None
+
+    p = sre_parse.parse( pat.pattern, pat.flags )
+    first, null = _seq( p, bool(p.state.flags & re.I) )
+    return (None if first is None else frozenset(first)), null
+
+def _literal(pat):
+    if not isinstance(pat.pattern,str):
+        return '', False, False
+
+    p = sre_parse.parse( pat.pattern, pat.flags )
+    pfx = []
+    for op, av in p:
+        if op is not sre_c.LITERAL:
+            break
+        pfx.append(chr(av))
+    return ''.join(pfx), len(pfx) == len(p), bool(p.state.flags & re.I)
+
+def literal_prefix(pat):
+    """
+    Literal string with which every match starts (possibly empty), and 
+    whether it is case-insensitive.
+    """
+    pfx, _, icase = _literal(pat)
+    return pfx, icase
+
+def literal(pat):
+    """
+    Literal string matched by the regex, and whether it is case-insensitive,
+    or None if the pattern is not a literal.
+    """
+    pfx, full, icase = _literal(pat)
+    return (pfx, icase) if full else None
+
+def union(sets):
+    """
+    Union of FIRST sets, None if any of them is None.
+    """
+    out = set()
+    for f in sets:
+        if f is None:
+            return None
+        out |= f
+    return frozenset(out)
@@ -1,6 +1,16 @@
 
+import re
 import logging
 from .match import TMatch
+from nxp.error import MatchError, CutError
+
+# ------------------------------------------------------------------------
+
+def _fulltext(cur):
+    try:
+        return cur.buffer.fulltext
+    except NotImplementedError:
+        return None
 
 # ------------------------------------------------------------------------
 
@@ -9,10 +19,20 @@ class Token:
     A Token is the abstract parent of all expressions (Regex, Set, Seq, etc.).
     They mainly implement the logic of a match with multiplicity.
 
-    Matching is implemented in derived classes and:
-    - returns TMatch if there is a match, otherwise throws MatchError;
+    Matching is implemented in derived classes (method _match) and:
+    - returns TMatch if there is a match, otherwise None;
     - takes a cursor in input, and updates it in case of match.
+
+    Composite tokens call attempt on their children, which does not raise
+    in case of failure; the public method match raises MatchError instead.
+
+    Static analysis (FIRST set and nullability, see expr.analysis) is 
+    implemented in derived classes (method _analyse), and computed once.
     """
+    _ana = None # cached analysis (first,nullable)
+    _leaf = False # match data is not a list of matches (see LazyMatch)
+    _cut = False # commits the enclosing Seq once matched (see Cut)
+    _test = False # zero-width, tested without a match in Seq (see And)
 
     def __init__(self):
         self._name = None 
@@ -38,17 +58,146 @@ class Token:
         Returns TMatch in case of successful match, 
         throws MatchError otherwise.
         """
-        raise NotImplementedError()
+        m = self.attempt(cur)
+        if m is None:
+            raise MatchError()
+        return m
+
+    def attempt(self,cur):
+        """
+        Returns TMatch in case of successful match, None otherwise (or 
+        raises CutError after a cut, see Cut).
+
+        If the cursor has a packrat memo (see expr.memo), the result is 
+        cached by token and position.
+        """
+        memo = cur.memo
+        if memo is None:
+            return self._match(cur)
+        else:
+            return memo.attempt(self,cur)
+
+    def test(self,cur):
+        """
+        True if the token matches at the cursor, which is not moved.
+        Failures after a cut are not propagated (see Cut).
+        """
+        mk = cur.mark()
+        try:
+            m = self.attempt(cur)
+        except CutError:
+            m = None
+        cur.restore(mk)
+        return m is not None
+
+    def _match(self,cur): # to be overloaded
+        """
+        Returns TMatch in case of successful match, None otherwise. 
+
+        Tokens which only overload match (raising MatchError on failure) 
+        are supported by calling it, and restoring the cursor on failure.
+        """
+        if type(self).match is Token.match:
+            raise NotImplementedError()
+
+        mk = cur.mark()
+        try:
+            return self.match(cur)
+        except CutError:
+            raise
+        except MatchError:
+            cur.restore(mk)
+            return None
+
+    def _jump(self):
+        """
+        Pattern matching the characters at which a match can start (within 
+        lines), or None if they are not known.
+        """
+        first, null = self.analysis()
+        if null is not False or not first or '\n' in first:
+            return None
+        return re.compile( '[' + ''.join(map( re.escape, sorted(first) )) + ']' )
+
+    # static analysis
+    def _analyse(self): # to be overloaded
+        return None, None # unknown
+
+    def analysis(self):
+        """
+        Returns tuple (first,nullable), see expr.analysis.
+        """
+        if self._ana is None:
+            self._ana = self._analyse()
+        return self._ana
+
+    def _reset(self):
+        self._ana = None
+
+    @property
+    def first(self): return self.analysis()[0]
+    @property
+    def nullable(self): return self.analysis()[1]
+
+    def excludes(self,ch):
+        """
+        True if no match can start with character ch (see Cursor.peek).
+        Nothing is excluded at the end of a line (ch=None).
+        """
+        first, null = self._ana or self.analysis()
+        return null is False and first is not None and ch is not None and ch not in first
 
     # search
     def find(self,cur,multi=False):
+        """
+        Generate matches from the cursor position until the end of the 
+        line, or with multi=True, until the end of the buffer. 
+
+        If the FIRST set of the token is known, the cursor jumps to the 
+        next character at which a match can start. Empty matches are 
+        reported once, and the cursor is moved to the next character.
+        Matches start at the end of a line only if it is empty (with 
+        multi=True), or if the token can match empty (e.g. Regex('$')).
+        """
         logging.debug('[Token] Find token at: L=%d, C=%d', *cur.pos)
+        jump = self._jump()
+        text = _fulltext(cur) if multi and jump is not None else None
+        null = self.nullable is not False
+
         end = 'eof' if multi else 'eol'
-        while not getattr(cur,end):
+        while True:
+
+            # jump within the line, or across lines with the buffer text
+            if cur.eol:
+                pass
+            elif text is not None:
+                s = jump.search( text, cur.filepos() )
+                if s is None:
+                    cur.goto_eof()
+                    break
+                cur.setoffset(s.start())
+            elif jump is not None:
+                s = cur.search(jump)
+                if s is None:
+                    cur.goto_eol()
+                else:
+                    cur.nextchar( s.start() - cur.char )
+
+            eol = cur.eol
+            mk = cur.mark()
             try:
-                yield self.match(cur)
-            except:
-                cur.nextchar()
+                m = None if eol and not (null or multi and cur.bol) else self.attempt(cur)
+            except CutError: # no match at this position
+                m = None
+                cur.restore(mk)
+            if m is not None:
+                yield m
+                if m.beg != m.end: continue
 
-            if multi and cur.eol:
+            # move to the next character, or to the next line
+            if not eol:
+                cur.nextchar()
+            elif getattr(cur,end):
+                break
+            else:
                 cur.nextline()
@@ -1,11 +1,13 @@
 
 import math
 import logging
-from .match import TMatch
+from .match import TMatch, LazyMatch
 from .base import Token
 from .content import conv
+from .analysis import union
+from .keywords import promote
 from .util import TokenSet
-from nxp.error import MatchError
+from nxp.error import CutError
 
 # ------------------------------------------------------------------------
 
@@ -24,20 +26,25 @@ class _TokenList(Token):
     def __iter__(self): return iter(self._tok)
     def __getitem__(self,key): return self._tok[key]
 
+    # modifications invalidate the static analysis
     def _assign(self,tok):
         assert len(tok) > 0, ValueError('List should contain at least one token.')
         self._tok = [ conv(t) for t in tok ]
+        self._reset()
 
     def prepend(self,tok):
         self._tok.insert(0,conv(tok))
+        self._reset()
         return self 
 
     def append(self,tok): 
         self._tok.append(conv(tok))
+        self._reset()
         return self 
 
     def extend(self,tok):
         self._tok.extend([ conv(t) for t in tok ])
+        self._reset()
         return self 
 
 # ------------------------------------------------------------------------
@@ -64,16 +71,113 @@ class Set(_TokenList):
         assert val >= 0, ValueError('min should be >= 0')
         self._min = val
         self._max = max(self._min,self._max)
+        self._reset()
     @max.setter
     def max(self,val):
         assert val >= self._min, ValueError('max should be >= min')
         self._max = val
 
-    def match(self,cur):
+    def _analyse(self):
+        # any token can be matched first
+        ana = [ t.analysis() for t in self._tok ]
+        if self._min == 0 or sum( n is True for _,n in ana ) >= self._min:
+            null = True
+        elif sum( n is not False for _,n in ana ) >= self._min:
+            null = None # depends on unknown tokens
+        else:
+            null = False
+        return union( f for f,_ in ana ), null
+
+    # largest number of tokens for which remaining tokens are tracked with 
+    # a bitmask, instead of a TokenSet
+    MAX_BITMASK = 64
+
+    # smallest number of literal tokens looked up in a trie (see keywords)
+    MIN_KEYWORDS = 8
+    _kw = False # trie, None if not applicable, False if not computed
+
+    def _reset(self):
+        super()._reset()
+        self._kw = False
+
+    def _keywords(self):
+        if self._kw is False:
+            self._kw = promote(self._tok) if len(self._tok) >= self.MIN_KEYWORDS else None
+        return self._kw
+
+    def _result(self,cur,pos,end,out):
+        if cur.lazy:
+            return LazyMatch( self, pos, end, cur.buffer, out )
+        return TMatch( self, pos, end, out, cur.buffer.span(pos,end) )
+
+    def _match(self,cur):
+        if self._max == 1:
+            return self._choice(cur)
+        elif len(self._tok) <= self.MAX_BITMASK:
+            return self._bitmask(cur)
+        else:
+            return self._tokenset(cur)
+
+    def _choice(self,cur):
+
+        # ordered choice: the first token to match (nothing allocated on failure)
+        alt = self._tok
+        trie = self._kw if self._kw is not False else self._keywords()
+        if trie is not None:
+            line, C = cur.mark()
+            k = trie.lookup( line.raw, C )
+            if k is None:
+                alt = () # none of the literals can match
+            else:
+                m = alt[k].attempt(cur)
+                if m is not None:
+                    return self._result( cur, m.beg, m.end, [m] )
+
+        ch = cur.peek()
+        for tok in alt:
+            if tok.excludes(ch): 
+                continue
+            m = tok.attempt(cur)
+            if m is not None:
+                return self._result( cur, m.beg, m.end, [m] )
+
+        if self._min == 0:
+            pos = cur.pos
+            return self._result( cur, pos, pos, [] )
+        return None
+
+    def _bitmask(self,cur):
+
+        # same as _tokenset, with a bitmask of remaining tokens
+        mk = cur.mark()
+        rem = (1 << len(self._tok)) - 1
+        out = []
+
+        while len(out) < self._max:
+            ch = cur.peek()
+            bit = 1
+            for tok in self._tok:
+                if rem & bit and not tok.excludes(ch):
+                    m = tok.attempt(cur)
+                    if m is not None:
+                        out.append(m)
+                        rem ^= bit
+                        break
+                bit <<= 1
+            else:
+                break # no match
+
+        if len(out) >= self._min:
+            return self._result( cur, (mk[0].lnum, mk[1]), cur.pos, out )
+        else:
+            cur.restore(mk)
+            return None
+
+    def _tokenset(self,cur):
 
         # use token set for fast removal and iteration
         tok = TokenSet(self._tok)
-        pos = cur.pos # remember initial position 
+        mk = cur.mark() # remember initial position 
         out = []
         nm = -1
 
@@ -82,23 +186,24 @@ class Set(_TokenList):
 
             # save current number of matches
             nm = len(out)
+            ch = cur.peek()
 
-            # attempt to match a token
+            # attempt to match a token (unless it cannot start with ch)
             for it in tok:
-                try:
-                    out.append(it.tok.match(cur))
+                if it.tok.excludes(ch): 
+                    continue
+                m = it.tok.attempt(cur)
+                if m is not None:
+                    out.append(m)
                     tok.remove(it) # remove token to match others
                     break
-                except MatchError:
-                    pass
 
         # check that sufficiently many tokens were matched
         if len(out) >= self._min:
-            txt = cur.buffer.between( pos, cur.pos )
-            return TMatch( self, pos, cur.pos, out, txt )
+            return self._result( cur, (mk[0].lnum, mk[1]), cur.pos, out )
         else:
-            cur.pos = pos # reset cursor to input position
-            raise MatchError()
+            cur.restore(mk) # reset cursor to input position
+            return None
 
 # ------------------------------------------------------------------------
 
@@ -137,21 +242,129 @@ class Seq(_TokenList):
     @property 
     def maxskip(self): return self._msk
 
-    def match(self,cur):
+    def _analyse(self):
+        # tokens which can be skipped behave as nullable for FIRST, but 
+        # the sequence is nullable only if enough of them can be skipped
+        first, req, unk, unreq = [], 0, 0, False
+        for k,t in enumerate(self._tok):
+            f, n = t.analysis()
+            first.append(f)
+            if n is False:
+                req += 1
+                if k not in self._skp:
+                    return union(first), False
+            elif n is None: # nullable or not
+                unk += 1
+                unreq = unreq or k not in self._skp
+
+        if req > self._msk:
+            return union(first), False
+        elif unreq or req + unk > self._msk:
+            return union(first), None
+        return union(first), True
+
+    def _jump(self):
+        # matches start with the first token, unless it can be skipped
+        tok = self._tok[0]
+        if 0 not in self._skp and tok.nullable is False:
+            return tok._jump()
+        return super()._jump()
+
+    def _match(self,cur):
         out = []
-        pos = cur.pos # save initial position for reset
+        mk = cur.mark() # save initial position for reset
         skp = 0
+        cut = False
 
         # iterate over tokens to be matched
         for k,tok in enumerate(self._tok):
-            try: # match tokens in sequence
-                out.append(tok.match(cur))
-            except MatchError:
+            if tok._test: # zero-width tokens are not kept in the match
+                ok = tok.test(cur)
+            else:
+                m = tok.attempt(cur) # match tokens in sequence
+                ok = m is not None
+                if ok: out.append(m)
+
+            if ok:
+                cut = cut or tok._cut # commit sequence
+            else:
                 skp += 1 # check number of skips and skip index
                 if skp > self._msk or k not in self._skp:
-                    cur.pos = pos # reset cursor and abort
-                    raise MatchError()
+                    cur.restore(mk) # reset cursor and abort
+                    if cut:
+                        raise CutError(f'Failed to match token after cut: {tok}')
+                    return None
         
         # success: save match
-        txt = cur.buffer.between( pos, cur.pos )
-        return TMatch( self, pos, cur.pos, out, txt )
+        pos, end = (mk[0].lnum, mk[1]), cur.pos
+        if cur.lazy:
+            return LazyMatch( self, pos, end, cur.buffer, out )
+        return TMatch( self, pos, end, out, cur.buffer.span(pos,end) )
+
+class Cut(Token):
+    """
+    Marker in a Seq, which commits the sequence once the tokens before it
+    are matched: if the tokens after it fail, CutError is raised instead of
+    returning None, such that enclosing tokens do not try alternatives,
+    and the rule fails immediately (see Context.match).
+
+    The cut matches the empty string, and is not included in the match of
+    the sequence.
+    """
+    _cut = True
+    _test = True
+
+    def __str__(self):
+        return '!'
+
+    def _analyse(self):
+        return frozenset(), True
+
+    def test(self,cur):
+        return True
+
+    def _match(self,cur):
+        pos = cur.pos
+        return TMatch( self, pos, pos, [], '' )
+
+class And(Token):
+    """
+    Lookahead: test whether the token matches at the cursor, without moving 
+    the cursor. Within a Seq, or as a rule pre-condition (e.g. action 
+    ('check',tok)), no match is created; otherwise the match is empty.
+    """
+    _test = True
+
+    def __init__(self,tok):
+        super().__init__()
+        self._tok = conv(tok)
+
+    @property
+    def token(self): return self._tok
+
+    def __str__(self):
+        return f'&({self._tok})'
+
+    # the FIRST set is not that of the token, because nothing is consumed
+    def _analyse(self):
+        return frozenset(), True
+
+    def test(self,cur):
+        return self._tok.test(cur)
+
+    def _match(self,cur):
+        if not self.test(cur):
+            return None
+        pos = cur.pos
+        return TMatch( self, pos, pos, [], '' )
+
+class Not(And):
+    """
+    Negative lookahead: test whether the token does NOT match at the cursor
+    (see And).
+    """
+    def __str__(self):
+        return f'~({self._tok})'
+
+    def test(self,cur):
+        return not self._tok.test(cur)
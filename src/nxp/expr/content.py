@@ -2,15 +2,23 @@
 import re
 import logging
 from typing import Pattern
-from .match import TMatch
-from .base import Token
-from nxp.error import MatchError
+from .match import TMatch, LazyMatch
+from .base import Token, _fulltext
+from .analysis import analyse_regex, literal_prefix
 
 # ------------------------------------------------------------------------
 
 class Regex(Token):
-    def __init__(self, pat, *arg, case=True):
+    """
+    Regular expression, matched at the cursor position within the current
+    line, or with multi=True, within the contiguous text of the buffer 
+    (such that matches can span multiple lines, see Cursor.match).
+    """
+    _leaf = True
+
+    def __init__(self, pat, *arg, case=True, multi=False):
         super().__init__()
+        self._multi = multi
 
         if isinstance(pat,str):
             flag = 0 if case else re.I 
@@ -30,28 +38,120 @@ class Regex(Token):
     def pattern(self): return self._pat.pattern
     @property
     def flags(self): return self._pat.flags
+    @property
+    def multi(self): return self._multi
 
     def __str__(self):
         return self.pattern
 
     # copy of regex is not implemented before Python 3.7
     def __copy__(self):
-        return Regex( self._pat )
+        return Regex( self._pat, multi=self._multi )
     def __deepcopy__(self,memo):
-        return Regex( self._pat )
+        return Regex( self._pat, multi=self._multi )
+
+    def _analyse(self):
+        return analyse_regex(self._pat)
 
-    def match(self,cur):
+    def _match(self,cur):
         
         # attempt to match regex at current position
         p = cur.pos
-        m = cur.match(self._pat)
+        m = cur.match(self._pat,self._multi)
 
         if m:
             # success: update cursor position
-            cur.nextchar(m.end() - m.start())
+            if self._multi:
+                cur.setoffset(m.end())
+            else:
+                cur.nextchar(m.end() - m.start())
+            if cur.lazy:
+                return LazyMatch( self, p, cur.pos, cur.buffer )
             return TMatch( self, p, cur.pos, m, m[0] )
         else:
-            raise MatchError()
+            return None
+
+    def test(self,cur):
+        return cur.match(self._pat,self._multi) is not None
+
+    def rematch(self,buf,pos):
+        """
+        Match pattern again at position of buffer (see LazyMatch).
+        """
+        L, C = pos
+        if self._multi:
+            return self._pat.match( buf.fulltext, buf[L].offset + C )
+        else:
+            return self._pat.match( buf[L].raw, C )
+
+    # search with the pattern instead of matching at each position
+    def _jump(self):
+        pfx, icase = literal_prefix(self._pat)
+        if len(pfx) > 1 and '\n' not in pfx:
+            return re.compile( re.escape(pfx), re.I if icase else 0 )
+        return super()._jump()
+
+    def find(self,cur,multi=False):
+        if self._multi:
+            yield from self._findtext(cur,multi)
+            return
+
+        # across lines, jump to candidates with the buffer text if possible
+        if multi and self._jump() is not None and _fulltext(cur) is not None:
+            yield from super().find(cur,multi)
+            return
+
+        end = 'eof' if multi else 'eol'
+        while True:
+            line, C = cur.mark()
+            m = cur.search(self._pat)
+
+            # matches at the end of the line are empty (see Token.find)
+            if m is not None:
+                b, e = m.span()
+                L = line.lnum
+                cur.nextchar(e - C)
+                yield TMatch( self, (L,b), (L,e), m, m[0] )
+                if b < len(line):
+                    if b == e: cur.nextchar()
+                    continue
+
+            cur.goto_eol()
+            if getattr(cur,end):
+                break
+            cur.nextline()
+
+    def _findtext(self,cur,multi):
+        buf = cur.buffer
+        end = 'eof' if multi else 'eol'
+        null = self.nullable is not False
+        while True:
+            m = cur.search(self._pat,True)
+            if m is None:
+                cur.goto_eof() if multi else cur.goto_eol()
+                break
+
+            # matches start at the end of a line only if it is empty, or
+            # if the pattern can match empty (see Token.find)
+            L, C = buf.pos_from_offset(m.start())
+            eol = C >= len(buf[L])
+            if not multi and L != cur.lnum:
+                cur.goto_eol()
+                break
+            elif eol and not null and (C > 0 or buf.is_last(buf[L])):
+                cur.setpos(L,C)
+            else:
+                cur.setoffset(m.end())
+                yield TMatch( self, (L,C), cur.pos, m, m[0] )
+                if m.start() < m.end(): continue
+
+            # move to the next character, or to the next line
+            if not cur.eol:
+                cur.nextchar()
+            elif getattr(cur,end):
+                break
+            else:
+                cur.nextline()
 
 # ------------------------------------------------------------------------
 
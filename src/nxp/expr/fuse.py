@@ -0,0 +1,246 @@
+
+import re
+import sys
+import math
+from copy import copy
+from .match import TMatch, LazyMatch
+from .base import Token
+from .content import Regex
+from .compose import Set, Seq
+from .repeat import Rep, mulist
+
+"""
+Fusion of expression trees into a single regex.
+
+Subtrees made of Seq, Set (with max=1) and Rep tokens, whose leaves are
+all Regex tokens, are replaced with a Fused token which matches a single
+compiled pattern, and rebuilds the corresponding TMatch tree on success.
+
+Tokens never backtrack into a completed match (e.g. a Rep is greedy and
+does not give back repetitions to the next token in a Seq), so the fused
+pattern wraps each token in an atomic group, and uses possessive
+quantifiers. These require Python 3.11+; with earlier versions, fuse
+returns its input unchanged.
+"""
+
+ENABLED = sys.version_info >= (3,11)
+
+# leaf patterns that cannot be embedded safely: backreferences, named
+# groups, conditionals, and global inline flags
+_unsafe = re.compile( r'\\[1-9]|\(\?P[<=>]|\(\?<[A-Za-z_]|\(\?\(|\(\?[aiLmsux-]*\)' )
+_flags = [ (re.I,'i'), (re.M,'m'), (re.S,'s'), (re.X,'x') ]
+_allowed = re.I | re.M | re.S | re.X | re.U
+
+# ------------------------------------------------------------------------
+
+class _Node:
+    """
+    Token in a fused tree, with the name of its group (if any), and the
+    nodes of its children. For Rep tokens, kids is a copy of the token with
+    fused children instead, which is used to rebuild the repetitions.
+    """
+    __slots__ = ('tok','name','kids')
+    def __init__(self,tok,name=None,kids=()):
+        self.tok = tok
+        self.name = name
+        self.kids = kids
+
+class _Builder:
+    """
+    Convert a token tree to a pattern, or raise TypeError if this is not
+    possible. Tokens outside of a Rep are captured in named groups.
+    """
+    def __init__(self):
+        self._num = 0
+
+    def node(self,tok,named=True):
+        if isinstance(tok,Regex):
+            pat, kids = self.regex(tok), ()
+        elif isinstance(tok,Seq):
+            pat, kids = self.seq(tok,named)
+        elif isinstance(tok,Set):
+            pat, kids = self.set(tok,named)
+        elif isinstance(tok,Rep):
+            pat, kids = self.rep(tok), None
+        else:
+            raise TypeError(f'Cannot fuse token: {type(tok)}')
+
+        if named:
+            if kids is None: kids = _fuse_children(tok)
+            self._num += 1
+            name = f'_n{self._num}'
+            return f'(?P<{name}>(?>{pat}))', _Node(tok,name,kids)
+        else:
+            return f'(?>{pat})', None
+
+    def regex(self,tok):
+        pat = tok._pat
+        if tok.multi or not isinstance(pat.pattern,str) or _unsafe.search(pat.pattern):
+            raise TypeError('Cannot fuse regex.')
+        if pat.flags & ~_allowed:
+            raise TypeError('Cannot fuse regex flags.')
+
+        on = ''.join( c for f,c in _flags if pat.flags & f )
+        off = ''.join( c for f,c in _flags if not pat.flags & f )
+        nl = '\n' if pat.flags & re.X else '' # end verbose comments
+        return f'(?{on}-{off}:{pat.pattern}{nl})' if off else f'(?{on}:{pat.pattern}{nl})'
+
+    def seq(self,tok,named):
+        # limited number of skips cannot be expressed
+        if tok.maxskip < len(tok.skip):
+            raise TypeError('Cannot fuse Seq with limited skips.')
+
+        pat, kids = [], []
+        for k,t in enumerate(tok):
+            p, n = self.node(t,named)
+            if k in tok.skip: p = f'(?>{p}|)'
+            pat.append(p)
+            kids.append(n)
+        return ''.join(pat), kids
+
+    def set(self,tok,named):
+        # only ordered choice can be expressed
+        if tok.max != 1:
+            raise TypeError('Cannot fuse Set with max > 1.')
+
+        pat, kids = [], []
+        for t in tok:
+            p, n = self.node(t,named)
+            pat.append(p)
+            kids.append(n)
+        if tok.min == 0: pat.append('')
+        return '(?:' + '|'.join(pat) + ')', kids
+
+    def rep(self,tok):
+        if not isinstance(tok._mul,mulist):
+            raise TypeError('Cannot fuse Rep with infinite multiplicity.')
+        if tok.possessive:
+            raise TypeError('Cannot fuse possessive Rep.')
+        # empty repetitions are not stopped in the same way by the regex engine
+        if tok.token.nullable is not False:
+            raise TypeError('Cannot fuse Rep of token which can match empty.')
+
+        X = self.node(tok.token,False)[0]
+        S = self.node(tok._sep,False)[0] if tok._sep else ''
+        SX = f'(?:{S}{X})' if S else X
+
+        # each range adds items to the previous one, only if it was satisfied
+        part, prev = [], 0
+        for a,b in tok._mul:
+            lo, hi = max(a-prev,0), b-prev
+            if prev > 0:
+                part.append(_quant( SX, lo, hi ))
+            elif hi == 0:
+                part.append('')
+            elif lo > 0: # the first item has no separator
+                part.append( X + _quant( SX, lo-1, hi-1 ) )
+            else:
+                part.append( f'(?:{X}{_quant( SX, 0, hi-1 )})?+' )
+            prev = b
+
+        pat = ''
+        for p in reversed(part[1:]):
+            pat = f'(?:{p}{pat})?+'
+        return part[0] + pat
+
+def _quant(p,a,b):
+    """
+    Possessive quantifier for pattern p, between a and b times.
+    """
+    if b == 0: return ''
+    if a == b == 1: return p
+    if a == b: return f'(?:{p}){{{a}}}'
+    hi = '' if b == math.inf else b
+    return f'(?:{p}){{{a},{hi}}}+'
+
+# ------------------------------------------------------------------------
+
+class Fused(Token):
+    """
+    Token tree matched with a single regex (see fuse). The matched tree is
+    rebuilt on success, with the original tokens (and therefore names, 
+    which should be saved before fusing). Repetitions are rebuilt by
+    matching the original Rep token again, which is why repetitions of
+    tokens that can match empty are not fused.
+    """
+    def __init__(self,tok):
+        super().__init__()
+        pat, self._root = _Builder().node(tok)
+        self._tok = tok
+        self._pat = re.compile(pat)
+
+    @property
+    def token(self): return self._tok
+    @property
+    def pattern(self): return self._pat.pattern
+
+    def __str__(self):
+        return str(self._tok)
+
+    def _analyse(self):
+        return self._tok.analysis()
+    def _jump(self):
+        return self._tok._jump()
+
+    def _match(self,cur):
+        line, C = cur.mark()
+        m = self._pat.match( line.raw, C )
+        if m is None:
+            return None
+
+        out = self._build( self._root, m, cur, line )
+        cur.restore(( line, m.end() ))
+        return out
+
+    def _build(self,node,m,cur,line):
+        tok, L = node.tok, line.lnum
+        b, e = m.span(node.name)
+
+        if isinstance(tok,Regex):
+            if cur.lazy:
+                return LazyMatch( tok, (L,b), (L,e), cur.buffer )
+            lm = tok._pat.match( line.raw, b )
+            return TMatch( tok, (L,b), (L,e), lm, lm[0] )
+        elif isinstance(tok,Rep):
+            cur.restore(( line, b ))
+            out = node.kids.match(cur)
+            assert out.end == (L,e), RuntimeError(f'Fused pattern and repetition disagree: {tok}')
+            out.tok = tok
+            return out
+        else:
+            out = [ self._build(k,m,cur,line) for k in node.kids if m.start(k.name) >= 0 ]
+            if cur.lazy:
+                return LazyMatch( tok, (L,b), (L,e), cur.buffer, out )
+            return TMatch( tok, (L,b), (L,e), out, cur.buffer.span((L,b),(L,e)) )
+
+# ------------------------------------------------------------------------
+
+def fuse(tok):
+    """
+    Replace the largest subtrees of input token which can be matched as a
+    single regex with Fused tokens. The input is not modified, and other
+    composite tokens are copied with fused children.
+    """
+    if not ENABLED or isinstance(tok,(Regex,Fused)):
+        return tok
+
+    try:
+        return Fused(tok)
+    except TypeError:
+        return _fuse_children(tok)
+
+def _fuse_children(tok):
+    """
+    Copy composite token with fused children.
+    """
+    if isinstance(tok,(Set,Seq)):
+        out = copy(tok)
+        out._tok = [ fuse(t) for t in tok ]
+    elif isinstance(tok,Rep):
+        out = copy(tok)
+        out._tok = fuse(tok._tok)
+        out._sep = fuse(tok._sep) if tok._sep else None
+    else:
+        return tok
+    out._reset()
+    return out
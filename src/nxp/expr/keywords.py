@@ -0,0 +1,125 @@
+
+import re
+import logging
+from .match import TMatch, LazyMatch
+from .base import Token
+from .content import Regex
+from .analysis import literal, union, _fold
+
+"""
+Matching of many literal strings at once.
+
+Words are stored in a trie, which is walked along the text at the cursor
+position, such that finding the matching word takes a single pass over
+at most as many characters as the longest word (instead of attempting to
+match each word in turn).
+"""
+
+# characters which match ASCII letters with re.IGNORECASE, but not lower()
+_lower = { c: k for k,v in _fold.items() for c in v }
+
+def _casefold(c):
+    return _lower.get(c) or c.lower()
+
+# ------------------------------------------------------------------------
+
+class Trie:
+    """
+    Trie of words, where each node is a dictionary of children by
+    character, and the index of the word ending at that node (key None).
+
+    With longest=True, lookup returns the longest matching word, otherwise
+    the first one (in order of declaration). With case=False, characters
+    are compared in lowercase.
+    """
+    __slots__ = ('_root','_fold','longest','maxlen')
+    def __init__(self, words, case=True, longest=True):
+        assert all(words), ValueError('Words should not be empty.')
+        self._root = dict()
+        self._fold = None if case else _casefold
+        self.longest = longest
+        self.maxlen = max(map(len,words), default=0)
+
+        for k,w in enumerate(words):
+            node = self._root
+            for c in (w if case else w.lower()):
+                node = node.setdefault(c,dict())
+            node.setdefault(None,k) # keep the first duplicate
+
+    def lookup(self,raw,char):
+        """
+        Index of the word matching raw at position char, or None.
+        """
+        node, best = self._root, None
+        fold = self._fold
+        for c in raw[char:char+self.maxlen]:
+            node = node.get(c if fold is None else fold(c))
+            if node is None:
+                break
+            k = node.get(None)
+            if k is not None and (best is None or self.longest or k < best):
+                best = k
+        return best
+
+def promote(tok):
+    """
+    Trie for a list of literal Regex tokens (first word in case of
+    ambiguity), or None if some are not literals, or differ in case
+    sensitivity (see Set).
+    """
+    words, icase = [], set()
+    for t in tok:
+        lit = literal(t._pat) if type(t) is Regex and not t.multi else None
+        if lit is None or not lit[0]:
+            return None
+        words.append(lit[0])
+        icase.add(lit[1])
+
+    # case-insensitive matching is equivalent to re for ASCII words only
+    if len(icase) > 1 or (True in icase and not all( w.isascii() for w in words )):
+        return None
+    return Trie( words, case=not icase.pop(), longest=False )
+
+# ------------------------------------------------------------------------
+
+class Keywords(Token):
+    """
+    Match one of many literal strings (not patterns), either the longest
+    (by default), or the first one declared. The match has the same
+    structure as with Xor, with the match of the corresponding Lit token
+    as a child.
+    """
+    def __init__(self, words, case=True, longest=True):
+        super().__init__()
+        assert len(words) > 0, ValueError('List should contain at least one word.')
+
+        self._words = list(words)
+        self._tok = [ Regex( re.escape(w), case=case ) for w in self._words ]
+        self._trie = Trie( self._words, case, longest )
+        logging.debug(f'[Keywords] Initialize with {len(self._words)} word(s).')
+
+    @property
+    def words(self): return self._words
+    @property
+    def longest(self): return self._trie.longest
+
+    def __len__(self): return len(self._words)
+    def __str__(self):
+        return '(' + '|'.join(self._words) + ')'
+
+    def _analyse(self):
+        return union( t.first for t in self._tok ), False
+
+    def _match(self,cur):
+        line, C = cur.mark()
+        k = self._trie.lookup( line.raw, C )
+        if k is None:
+            return None
+
+        m = self._tok[k].attempt(cur)
+        if m is None:
+            return None
+        elif cur.lazy:
+            return LazyMatch( self, m.beg, m.end, cur.buffer, [m] )
+        else:
+            return TMatch( self, m.beg, m.end, [m], cur.buffer.span(m.beg,m.end) )
@@ -8,7 +8,8 @@ class TMatch:
     """
     Nested match data (e.g. in the context of Seq or Set), is stored in the 
     'data' field of the corresponding match. This allows for arbitrarily deep 
-    nesting. The matched text is stored in the field 'text'.
+    nesting. The matched text is stored in the field 'text'; for composite
+    tokens, this is a lazy Span which only extracts the text when used.
     """
     __slots__ = ('tok','beg','end','data','text')
 
@@ -46,7 +47,7 @@ class TMatch:
     # traversal and named matches
     def traverse(self):
         yield self 
-        if isinstance(self.data,list):
+        if not self.isregex():
             for m in self.data:
                 yield from m.traverse()
     
@@ -74,4 +75,57 @@ class TMatch:
     def insitu(self,buf,w=13):
         s,x = buf.show_between( self.beg, self.end, w )
         return '\n'.join([s,x])
+
+# ------------------------------------------------------------------------
+
+class LazyMatch(TMatch):
+    """
+    TMatch created by tokens when the cursor is lazy (see Cursor.lazy).
+    The text is extracted from the buffer on first access, and for regex
+    tokens, the match data is obtained by matching the pattern again when
+    requested (see Regex.rematch, and Rep.rematch for repetitions of 
+    regex). Matched lines should therefore remain available in the buffer
+    (which is not the case with StreamBuffer).
+    """
+    __slots__ = ('_buf',)
+
+    # cached values are stored in the slots of TMatch
+    _text = TMatch.text
+    _data = TMatch.data
+
+    def __init__(self,tok,beg,end,buf,data=None):
+        self.tok = tok
+        self.beg = beg
+        self.end = end
+        self._buf = buf
+        if data is not None:
+            self._data = data
+
+    @property
+    def text(self):
+        try:
+            return self._text
+        except AttributeError:
+            self._text = t = self._buf.between( self.beg, self.end )
+            return t
+    @text.setter
+    def text(self,val):
+        self._text = val
+
+    @property
+    def data(self):
+        try:
+            return self._data
+        except AttributeError:
+            self._data = d = self.tok.rematch( self._buf, self.beg )
+            return d
+    @data.setter
+    def data(self,val):
+        self._data = val
+
+    def isregex(self):
+        try:
+            return not isinstance(self._data,list)
+        except AttributeError:
+            return self.tok._leaf
         
\ No newline at end of file
@@ -0,0 +1,71 @@
+
+_miss = object()
+
+# ------------------------------------------------------------------------
+
+class Memo:
+    """
+    Packrat cache of token matches, keyed on token identity and cursor
+    position. Both successes (TMatch and end position) and failures are
+    stored, such that subexpressions are only matched once per position.
+
+    Set the memo on a cursor to use it (see Token.attempt), e.g. with option
+    memo of Parser. Entries are stored by line, and lines more than
+    'behind' lines before the current one are evicted.
+    """
+    def __init__(self, behind=2):
+        assert behind >= 0, ValueError('behind should be >= 0')
+        self._tab = dict()
+        self._low = 0
+        self.behind = behind
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum( len(t) for t in self._tab.values() )
+
+    @property
+    def nlines(self): return len(self._tab)
+    @property
+    def rate(self):
+        n = self.hits + self.misses
+        return self.hits / n if n > 0 else 0
+
+    def stats(self):
+        return { 'hits': self.hits, 'misses': self.misses, 'rate': self.rate, 'size': len(self) }
+
+    def clear(self):
+        self._tab.clear()
+        self._low = 0
+        return self
+
+    def _table(self,lnum):
+        tab = self._tab.get(lnum)
+        if tab is None:
+            tab = self._tab[lnum] = dict()
+
+            # evict lines behind
+            low = lnum - self.behind
+            if low > self._low:
+                for L in [ L for L in self._tab if L < low ]:
+                    del self._tab[L]
+                self._low = low
+        return tab
+
+    def attempt(self,tok,cur):
+        line, char = cur.mark()
+        tab = self._table(line.lnum)
+        key = (id(tok), char)
+
+        res = tab.get(key,_miss)
+        if res is _miss:
+            self.misses += 1
+            m = tok._match(cur)
+            tab[key] = None if m is None else ( m, cur.mark() )
+            return m
+
+        self.hits += 1
+        if res is None:
+            return None
+        cur.restore(res[1])
+        return res[0]
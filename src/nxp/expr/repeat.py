@@ -1,19 +1,39 @@
 
 import logging
-from copy import deepcopy
-from .match import TMatch
+from bisect import bisect_right
+from .match import TMatch, LazyMatch
 from .base import Token
-from .content import conv
-from .util import TokenChain
-from nxp.error import MatchError
+from .content import Regex, conv
 
 # ------------------------------------------------------------------------
 
 """
-Multiplicity objects are tuple generators. 
+Multiplicity objects are immutable tuple generators. 
 Each tuple must be of the form (min,max).
+
+They also define the smallest and largest number of repetitions allowed
+(min and max), and the method best(n), which returns the largest allowed
+number of repetitions <= n (or None). Rep matches the token greedily (at
+most max times), and keeps the best number of repetitions.
 """
 
+INF = float('Inf')
+
+class mulist(tuple):
+    """
+    Ranges sorted by lower bound, without overlap.
+    """
+    __slots__ = ()
+    @property
+    def min(self): return self[0][0]
+    @property
+    def max(self): return self[-1][1]
+
+    def best(self,n):
+        # ranges with lower bound <= n
+        k = bisect_right( self, (n,INF) )
+        return min( n, self[k-1][1] ) if k > 0 else None
+
 class mulrange:
     """
     Convert integer range to tuple generator.
@@ -34,6 +54,17 @@ class mulrange:
         for m in self.range:
             yield m,m
 
+    @property
+    def min(self): return self.range[0]
+    @property
+    def max(self): return self.range[-1]
+
+    def best(self,n):
+        r = self.range
+        if n < r.start:
+            return None
+        return r[min( (n - r.start) // r.step, len(r)-1 )]
+
 class mulseq:
     """
     Infinite sequence as multiplicity
@@ -54,9 +85,47 @@ class mulseq:
     def __getitem__(self,k):
         return self.step*k + self.value 
     def __iter__(self):
+        v = self.value
         while True:
-            yield self.value, self.value
-            self.value += self.step
+            yield v, v
+            v += self.step
+
+    @property
+    def min(self): return self.value
+    @property
+    def max(self): return INF
+
+    def best(self,n):
+        if n < self.value:
+            return None
+        return n - (n - self.value) % self.step
+
+class muliter:
+    """
+    Other iterable of ranges, which should yield the same ranges every time
+    it is iterated. The largest number of repetitions is assumed infinite.
+    """
+    __slots__ = ('iter')
+    def __init__(self,mul):
+        self.iter = mul
+    def __str__(self):
+        return str(self.iter)
+    def __repr__(self):
+        return repr(self.iter)
+    def __iter__(self):
+        return iter(self.iter)
+
+    @property
+    def min(self): return next(iter(self.iter))[0]
+    @property
+    def max(self): return INF
+
+    def best(self,n):
+        out = None
+        for a,b in self.iter:
+            if a > n: break
+            out = min(n,b)
+        return out
 
 def mulparse(mul):
     """
@@ -66,9 +135,10 @@ def mulparse(mul):
         tuple 
         list therof
         range object
+        multiplicity object
         iterable object
 
-    Output is either a list of range tuples sorted by lower bound, or a multiplicity object.
+    Output is a multiplicity object, e.g. mulist of range tuples sorted by lower bound.
     """
 
     # check utils
@@ -78,7 +148,9 @@ def mulparse(mul):
 
     # first, convert input to a list
     out = []
-    if isinstance(mul,str):
+    if isinstance(mul,(mulist,mulrange,mulseq,muliter)):
+        return mul # immutable
+    elif isinstance(mul,str):
         out.extend(mul.split(','))
     elif isinstance(mul,int):
         out.append(mul)
@@ -87,7 +159,7 @@ def mulparse(mul):
     elif isinstance(mul,list):
         out.extend(mul)
     elif isinstance(mul,range):
-        assert mul.start > 0 and mul.step > 0, ValueError(f'Bad range: {mul}')
+        assert len(mul) > 0 and mul.start > 0 and mul.step > 0, ValueError(f'Bad range: {mul}')
         return mulrange(mul)
     else:
         # there could be an infinite number of ranges (e.g. odd multiplicities)
@@ -97,7 +169,7 @@ def mulparse(mul):
         m1 = next(it)
         assert valid(m0) and valid(m1) and not overlap(m0,m1), ValueError(f'Bad iterable: {mul}')
         
-        return deepcopy(mul)
+        return muliter(mul)
 
     # second, rebuild list by converting each element
     for k,x in enumerate(out):
@@ -112,7 +184,7 @@ def mulparse(mul):
                 '5-'    =>  (0,5)     fewer than 5
             """
             if x.endswith('+'):
-                x = ( int(x[:-1]), float('Inf') )
+                x = ( int(x[:-1]), INF )
             elif x.endswith('-'):
                 x = ( 0, int(x[:-1]) )
             elif '-' in x:
@@ -132,68 +204,162 @@ def mulparse(mul):
         if overlap(a,b):
             raise ValueError(f'Overlapping multiplicities {a} and {b}.')
 
-    return out
+    return mulist(out)
 
 # ------------------------------------------------------------------------
 
 class Rep(Token):
-    def __init__(self,tok,mul,sep=None):
+    """
+    Repetition of token (with separator), where the number of repetitions
+    is constrained by multiplicity (see mulparse). Repetitions are matched
+    greedily, and never given back to the following tokens.
+
+    With possessive=True, the repetition also commits the enclosing Seq 
+    once matched, as if followed by a Cut.
+    """
+    def __init__(self,tok,mul,sep=None,possessive=False):
         super().__init__()
 
         self._tok = conv(tok)
         self._mul = mulparse(mul)
         self._sep = conv(sep) if sep else None
+        self._cut = possessive
+
+        # a token matching empty would be repeated indefinitely (unless
+        # nullability is unknown, e.g. custom tokens)
+        assert not ( self._mul.max == INF and self._tok.nullable is True and \
+            (self._sep is None or self._sep.nullable is True) ), \
+            ValueError(f'Unbounded repetition of token which can match empty: {tok}')
 
         logging.debug(f'[Rep] Initialise with token: {tok}')
 
     @property
     def token(self): return self._tok
+    @property
+    def possessive(self): return self._cut
 
     def __str__(self):
         return f'#({self._tok})'
 
-    def match(self,cur):
-        out = TokenChain()
-        pos = cur.pos
-        chk = None
-        
-        # iterate over ranges
-        for rmin, rmax in self._mul:
-
-            while len(out) < rmax:
-
-                # remember position before separator
-                tmp = cur.pos 
-                try:
-                    # match separator if at least one match exists
-                    if self._sep and len(out) > 0:
-                        self._sep.match(cur) 
-
-                    # match token
-                    out.append(self._tok.match(cur))
-                except MatchError:
-                    cur.pos = tmp # restore position before separator
-                    break
-
-            # Note: we should check that at least one match was successful
-            # for the current range. But actually testing against rmin is
-            # sufficient, because ranges are not allowed to overlap. This
-            # is critical: the upper bound of one range should be STRICTLY
-            # less than the lower bound of the next range.
-            if len(out) >= rmin:
-                chk = cur.pos # update checkpoint
-                out.commit()
-            else:
-                out.revert()
+    def _analyse(self):
+        first, null = self._tok.analysis()
+        return first, True if self._mul.min == 0 else null
+
+    # patterns of token and separator, None if not applicable, False if not computed
+    _rx = False
+
+    def _reset(self):
+        super()._reset()
+        self._rx = False
+
+    def _regex(self):
+        """
+        Patterns of token and separator (None without separator), if both 
+        are single-line Regex tokens, otherwise None.
+        """
+        isrx = lambda t: type(t) is Regex and not t.multi
+        sep = self._sep
+        if isrx(self._tok) and (sep is None or isrx(sep)):
+            return self._tok._pat, (sep._pat if sep else None)
+        return None
+
+    def _scan(self,raw,char):
+        """
+        Match regex repetitions greedily from position char in raw, without
+        the cursor. Returns the list of re.Match objects, truncated to the
+        number of repetitions allowed by multiplicity, or None.
+        """
+        X, S = self._rx
+        n, out, p = self._mul.max, [], char
+        while len(out) < n:
+            q = p
+            if S is not None and out:
+                s = S.match( raw, p )
+                if s is None: break
+                q = s.end()
+            x = X.match( raw, q )
+            if x is None: break
+            out.append(x)
+
+            # stop unbounded repetitions of empty iterations (see _match)
+            if n == INF and x.end() == p and (S is None or len(out) > 1):
                 break
-        
-        # sanity check
-        assert out.isvalid(), RuntimeError('[bug] Invalid TokenChain.')
-
-        # if no checkpoint was created, then no range was satisfied
-        if chk is None:
-            raise MatchError()
-        else:
-            cur.pos = chk # restore cursor to last checkpoint
-            txt = cur.buffer.between( pos, cur.pos )
-            return TMatch( self, pos, cur.pos, out.tok, txt )
+            p = x.end()
+
+        n = self._mul.best(len(out))
+        if n is None:
+            return None
+        del out[n:]
+        return out
+
+    def rematch(self,buf,pos):
+        """
+        Match repetitions of regex again at position of buffer (see LazyMatch).
+        """
+        L, C = pos
+        return [ TMatch( self._tok, (L,x.start()), (L,x.end()), x, x[0] ) 
+            for x in self._scan( buf[L].raw, C ) ]
+
+    def _match(self,cur):
+        if self._rx is False:
+            self._rx = self._regex()
+        if self._rx is not None:
+            return self._match_regex(cur)
+
+        # match greedily, remembering the position after each repetition
+        out, pos = [], [cur.mark()]
+        n = self._mul.max
+        while len(out) < n:
+
+            # match separator if at least one match exists, then token
+            m = None
+            if self._sep and len(out) > 0:
+                if self._sep.attempt(cur) is not None:
+                    m = self._tok.attempt(cur)
+            elif not self._tok.excludes(cur.peek()):
+                m = self._tok.attempt(cur)
+
+            if m is None:
+                break
+            out.append(m)
+            pos.append(cur.mark())
+
+            # stop unbounded repetitions when an iteration (separator and 
+            # token) matches empty, since tokens whose nullability is unknown
+            # are not rejected on construction; the first iteration has no
+            # separator, and is only checked without separator
+            if n == INF and (self._sep is None or len(out) > 1) and \
+                pos[-1][1] == pos[-2][1] and pos[-1][0] is pos[-2][0]:
+                break
+
+        # keep the largest number of repetitions allowed
+        n = self._mul.best(len(out))
+        if n is None:
+            cur.restore(pos[0]) # reset cursor to input position
+            return None
+
+        del out[n:]
+        cur.restore(pos[n])
+        mk = pos[0]
+        pos, end = (mk[0].lnum, mk[1]), cur.pos
+        if cur.lazy:
+            return LazyMatch( self, pos, end, cur.buffer, out )
+        return TMatch( self, pos, end, out, cur.buffer.span(pos,end) )
+
+    def _match_regex(self,cur):
+        line, C = cur.mark()
+        out = self._scan( line.raw, C )
+        if out is None:
+            return None
+
+        L = line.lnum
+        E = out[-1].end() if out else C
+        cur.nextchar(E - C)
+        pos, end = (L,C), (L,E)
+
+        # repetitions are only built when accessed
+        if cur.lazy:
+            return LazyMatch( self, pos, end, cur.buffer )
+
+        out = [ TMatch( self._tok, (L,x.start()), (L,x.end()), x, x[0] ) for x in out ]
+        return TMatch( self, pos, end, out, cur.buffer.span(pos,end) )
@@ -1,7 +1,7 @@
 
 import re 
 from .ruledef import make_rule
-from nxp import Cursor, ListBuffer, FileBuffer, Transform, Scope, Parser
+from nxp import Cursor, ListBuffer, FileBuffer, StreamBuffer, Transform, Scope, Parser, open_text
 
 # ------------------------------------------------------------------------
 # EXPRESSION
@@ -126,20 +126,55 @@ def make_parser(p):
         # start/end scopes
         start = p.setdefault('start','main')
         finish = p.setdefault('finish',None)
+        history = p.get('history',None)
+        memo = p.get('memo',None)
+        lazy = p.get('lazy',False)
 
-        return Parser(scope,start,finish)
+        return Parser(scope,start,finish,history=history,memo=memo,lazy=lazy)
     else:
         raise TypeError(f'Unexpected type: {type(p)}')
 
+# default number of rule matches kept in the history when streaming
+STREAM_HISTORY = 100
+
+def _bounded( parser, history ):
+    """
+    Parser keeping at most 'history' rule matches in the history of the
+    context, unless the input parser or definition sets it already.
+    """
+    if isinstance(parser,dict):
+        return make_parser({ 'history': history, **parser })
+    elif isinstance(parser,Parser) and parser.history is None and history is not None:
+        return parser.clone(history=history)
+    return parser
+
 def parsebuf( parser, buffer ):
     return make_parser(parser).parse(buffer.cursor())
 
-def parsefile( parser, fpath, r2l=False ):
-    return parsebuf( parser, FileBuffer(fpath,r2l) )
+def parsefile( parser, fpath, r2l=False, stream=False, history=STREAM_HISTORY, **kv ):
+    """
+    Parse input file (possibly compressed, see io.util.open_text). 
+    With stream=True, the file is read on demand using a StreamBuffer,
+    and the history of rule matches is bounded (see parsestream).
+    """
+    if stream:
+        with open_text(fpath) as fh:
+            return parsebuf( _bounded(parser,history), StreamBuffer(fh,r2l,**kv) )
+    else:
+        return parsebuf( parser, FileBuffer(fpath,r2l) )
 
 def parsetext( parser, text, r2l=False ):
     return parsebuf( parser, ListBuffer(text.splitlines(True),r2l) )
 
+def parsestream( parser, src, r2l=False, history=STREAM_HISTORY, **kv ):
+    """
+    Parse lines from iterable src with a StreamBuffer (see io.buffer). 
+    Only the last 'history' rule matches are kept in the context (None 
+    to keep all), unless the parser sets its own history, such that 
+    memory does not grow with the input.
+    """
+    return parsebuf( _bounded(parser,history), StreamBuffer(src,r2l,**kv) )
+
 # ------------------------------------------------------------------------
 # PROCESSING
 # ------------------------------------------------------------------------
@@ -164,7 +199,8 @@ def procbuf( parser, callback, buffer, first=(0,0), last=None, **kv ):
 def procfile( parser, callback, infile, r2l=False, **kv ):
     """
     Process input file using callback function to transform every match 
-    in the "main" scope found during parsing. 
+    in the "main" scope found during parsing. Compressed files (gzip, 
+    bz2, xz) are decompressed while reading.
     
     The callback function should be:
         callback( transform, element )
@@ -1,4 +1,6 @@
 
 from .buffer import *
 from .cursor import *
+from .span import *
+from .cache import BufferCache
 from .transform import *
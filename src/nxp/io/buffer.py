@@ -1,12 +1,24 @@
 
 """
 A buffer is essentially a list of Line objects.
-More complicated buffers (e.g. with stream and cache-drop) can be implemented later.
+More complicated buffers (e.g. with stream and cache-drop) are implemented
+with list-like sequences that create or retain Line objects on demand.
 """
 
-from .line import Line
-from .cursor import Cursor
+from .line import Line, RevLine
+from .cursor import Cursor, StreamCursor
+from .span import Span
+from .cache import Cache
+from .index import MappedLines, StreamLines, TextLines, ByteIndex
+from .util import blocks, segment_lines, segment_text, open_text, is_compressed
+from itertools import accumulate, chain, count, islice
+from operator import add, attrgetter
+from bisect import bisect_right
+from array import array
 import logging
+import locale
+import weakref
+import mmap
 
 # ------------------------------------------------------------------------
 
@@ -14,21 +26,64 @@ class _Buffer:
     def __init__(self):
         self._r2l = False
         self._line = []
+        self._off = None
+        self._text = None
+
+    @staticmethod
+    def _makeline(line,lnum,offset,r2l=False):
+        if r2l:
+            return RevLine(line,lnum,offset)
+        else:
+            return Line(line,lnum,offset)
 
     def _readlines(self,obj,r2l):
-        offset = 0
-        for lnum,line in enumerate(obj):
-            if r2l:
-                self._line.append(Line(line[::-1],lnum,offset))
-            else:
-                self._line.append(Line(line,lnum,offset))
-            offset += len(line)
+        """
+        Read list of strings, each corresponding to a line.
+        """
+        if not isinstance(obj,list): obj = list(obj)
+        self._addlines( obj, r2l )
+        self._r2l = r2l
 
+        # notify
+        logging.info(f'Buffer initialized ({len(self)} lines).')
+
+    def _readtext(self,chunks,r2l):
+        """
+        Read chunks of text, split after each newline.
+        """
+        for block in blocks(chunks):
+            self._addlines( block, r2l )
         self._r2l = r2l
 
         # notify
         logging.info(f'Buffer initialized ({len(self)} lines).')
 
+    def _addlines(self,obj,r2l):
+        """
+        Append lines from a list of strings, or from a block of text.
+        Lines are segmented in bulk, see io.util.segment_lines, and a Line
+        object is created for each of them, as a view of the original text
+        (reversed on demand if r2l); see TextBuffer for lines created on 
+        demand instead.
+        """
+        if self._line:
+            last = self._line[-1]
+            start = last.offset + len(last.full)
+        else:
+            start = 0
+
+        if isinstance(obj,str):
+            raw, nl, bot, eot = segment_text(obj)
+        else:
+            raw, nl, bot, eot = segment_lines(obj)
+
+        # right-to-left lines are reversed on demand
+        view = RevLine.view if r2l else Line.view
+        offset = accumulate(chain( [start], map(add, map(len,raw), map(len,nl)) ))
+        lines = map( view, raw, nl, bot, eot, count(len(self._line)), offset )
+
+        self._line.extend(lines)
+
     def write(self,filename):
         with open(filename,'w') as fh:
             fh.writelines( L.full for L in self._line )
@@ -88,6 +143,32 @@ class _Buffer:
     def between(self,pos1,pos2,nl='\n'):
         return nl.join(self.lbetween(pos1,pos2))
 
+    def span(self,pos1,pos2):
+        """
+        Lazy version of between, see io.span.Span.
+        """
+        return Span(self,pos1,pos2)
+
+    @property
+    def fulltext(self):
+        """
+        Contiguous text of the buffer, including newlines, such that the 
+        offset of each position is given by Cursor.filepos. This is built
+        on first use (see Cursor.match with multi=True).
+
+        Lines without newline (e.g. ListBuffer from strings without '\n')
+        would be joined, so the text is not available unless only the last
+        line has no newline.
+        """
+        if self._text is None:
+            if any( not L.nl for L in islice( self._line, len(self._line)-1 ) ):
+                self._text = False
+            else:
+                self._text = ''.join( L.full for L in self._line )
+        if self._text is False:
+            raise NotImplementedError('Contiguous text is not available for lines without newline.')
+        return self._text
+
     def distance(self,pos1,pos2):
         L1, C1 = pos1
         L2, C2 = pos2
@@ -95,6 +176,71 @@ class _Buffer:
         off2 = self._line[L2].offset
         return (off2+C2) - (off1+C1)
 
+    # ----------  =====  ----------
+    # Offset-related
+    #
+    # Offsets are character counts from the beginning of the buffer, 
+    # consistent with Cursor.filepos and distance above.
+
+    def _offsets(self):
+        """
+        Return an array with the offset of each line (possibly followed by
+        additional items), and the line number of the first item.
+        """
+        if self._off is None:
+            self._off = array( 'q', map(attrgetter('offset'), self._line) )
+        return self._off, 0
+
+    def _linelen(self,lnum):
+        return len(self._line[lnum])
+
+    def pos_from_offset(self,offset):
+        """
+        Convert offset to position (line,char) in O(log n).
+        Offsets within newline characters map to the end of the line.
+        """
+        return self.pos_from_offsets([offset])[0]
+
+    def pos_from_offsets(self,offsets):
+        """
+        Convert many offsets to positions at once.
+        """
+        off, first = self._offsets()
+        last = len(self) - first - 1
+        out = []
+        for x in offsets:
+            k = min( bisect_right(off,x)-1, last )
+            if k < 0:
+                raise IndexError(f'Offset out of range: {x}')
+            L = first + k
+            out.append(( L, min(x - off[k], self._linelen(L)) ))
+        return out
+
+    def cursor_at_offset(self,offset):
+        return self.cursor(*self.pos_from_offset(offset))
+
+    # ----------  =====  ----------
+    # Byte offsets in the input file
+
+    def _byteindex(self):
+        """
+        Return the ByteIndex of the input file, and the line number in the
+        file of the first line in the buffer.
+        """
+        raise NotImplementedError('Byte offsets are only available for file buffers.')
+
+    def byteoffset(self,pos):
+        """
+        Byte offset of position (line,char) in the input file.
+        """
+        idx, first = self._byteindex()
+        L, C = pos
+        line = self._line[L]
+        if self._r2l:
+            return idx.byteoffset( first+L, line.source[:len(line)-C] )
+        else:
+            return idx.byteoffset( first+L, line.raw[:C] )
+
     # ----------  =====  ----------
     # Display
 
@@ -133,12 +279,63 @@ class _Buffer:
 class FileBuffer(_Buffer):
     """
     Buffer instance from input file.
+    Compressed files (gzip, bz2, xz) are decompressed while reading.
+    Lines can be shared between buffers from unchanged files, see io.cache.
+
+    A region of the file can be read by specifying a range of lines 
+    (first,last) with last excluded, using a byte index of the file (see 
+    io.index.ByteIndex). The index is built on demand, and option 'index'
+    can be either a ByteIndex, or a sidecar file to load/save it from/to
+    (True for the default name). In that case, line numbers and offsets
+    are relative to the region, but byte offsets are not.
     """
-    def __init__(self, filename, r2l=False):
+    CHUNK = 1 << 20
+
+    def __init__(self, filename, r2l=False, lines=None, index=None, encoding=None):
         super().__init__()
         logging.info(f'Initializing buffer from file: "{filename}"')
-        with open(filename) as fh:
-            self._readlines(fh,r2l)
+
+        self._file = filename
+        self._enc = encoding or locale.getpreferredencoding(False)
+        self._first = 0
+        if isinstance(index,ByteIndex):
+            self._bidx, self._side = index, None 
+        else:
+            self._bidx, self._side = None, index
+
+        if lines is not None:
+            self._readregion( *lines, r2l )
+            return
+
+        # reuse lines if the file was already read (see io.cache)
+        key = Cache.key(filename,r2l,encoding)
+        lines = Cache.get(key)
+        if lines is not None:
+            self._line = lines
+            self._r2l = r2l
+            return
+
+        with open_text(filename,encoding) as fh:
+            self._readtext( iter(lambda: fh.read(self.CHUNK), ''), r2l )
+        Cache.put(key,self._line)
+
+    def _readregion(self,first,last,r2l):
+        b, e = self.byteindex().byterange(first,last)
+        with open(self._file,'rb') as fh:
+            fh.seek(b)
+            text = fh.read(e-b).decode(self._enc)
+
+        self._first = first
+        self._readtext( [text.replace('\r\n','\n')], r2l )
+
+    def byteindex(self):
+        if self._bidx is None:
+            assert not is_compressed(self._file), ValueError('Byte offsets are not available for compressed files.')
+            self._bidx = ByteIndex.open( self._file, self._enc, self._side )
+        return self._bidx
+
+    def _byteindex(self):
+        return self.byteindex(), self._first
 
 # ------------------------------------------------------------------------
 
@@ -150,3 +347,175 @@ class ListBuffer(_Buffer):
         super().__init__()
         logging.info('Initializing buffer from string list.')
         self._readlines(strlist,r2l)
+
+# ------------------------------------------------------------------------
+
+class MappedBuffer(_Buffer):
+    """
+    Buffer instance from memory-mapped input file.
+
+    Only line offsets are indexed upon initialization, and Line objects
+    are created on first access (the most recent ones are cached).
+    Unlike FileBuffer, newlines are not translated: lines are split on 
+    '\n', and '\r\n' is kept as the newline of the corresponding line.
+    """
+    def __init__(self, filename, r2l=False, encoding='utf-8', cache=1024):
+        super().__init__()
+        logging.info(f'Initializing mapped buffer from file: "{filename}"')
+        assert not is_compressed(filename), ValueError('Compressed files cannot be mapped, use FileBuffer or StreamBuffer instead.')
+        with open(filename,'rb') as fh:
+            try:
+                data = mmap.mmap( fh.fileno(), 0, access=mmap.ACCESS_READ )
+            except ValueError: # empty file
+                data = b''
+
+        make = lambda line,lnum,offset: self._makeline(line,lnum,offset,r2l)
+        self._line = MappedLines( data, make, encoding, cache )
+        self._r2l = r2l
+
+        logging.info(f'Buffer initialized ({len(self)} lines).')
+
+    def _offsets(self):
+        return self._line._coff, 0
+
+    def _byteindex(self):
+        L = self._line
+        return ByteIndex( L._boff, L._coff, L._enc ), 0
+
+    @property
+    def fulltext(self):
+        if self._text is None and not self._r2l:
+            self._text = self._line._data[:].decode(self._line._enc)
+        return super().fulltext
+
+    def close(self):
+        self._line.close()
+
+# ------------------------------------------------------------------------
+
+class StreamBuffer(_Buffer):
+    """
+    Buffer instance from a stream of lines (e.g. file handle or pipe).
+    Use open_text to stream (possibly compressed) files.
+
+    Lines are read in chunks as the cursors move forward, and only lines
+    after the lowest position of all cursors created by this buffer are
+    retained (with a margin of 'keep' lines). Moving a cursor before the 
+    retained window raises a WindowError.
+    """
+    def __init__(self, src, r2l=False, chunk=1024, keep=0):
+        super().__init__()
+        logging.info('Initializing buffer from stream.')
+
+        self._cur = weakref.WeakValueDictionary()
+        make = lambda line,lnum,offset: self._makeline(line,lnum,offset,r2l)
+        self._line = StreamLines( src, make, self._lowest, chunk, keep )
+        self._r2l = r2l
+
+    def _lowest(self):
+        return min( (c.lnum for c in self._cur.values()), default=len(self._line) )
+
+    def is_last(self,line): 
+        return line.lnum == len(self)-1 and self._line.eof
+
+    def pos_from_offsets(self,offsets):
+        # read ahead until all offsets are covered
+        offsets = list(offsets)
+        line = self._line
+        while offsets and not line.eof and line._off <= max(offsets):
+            line._fill(len(line))
+        return super().pos_from_offsets(offsets)
+
+    def _offsets(self):
+        # only retained lines, which change as the stream is read
+        return array( 'q', map(attrgetter('offset'), self._line._line) ), self._line.first
+
+    def span(self,pos1,pos2):
+        # lines may be dropped before the text is used
+        return self.between(pos1,pos2)
+
+    @property
+    def fulltext(self):
+        raise NotImplementedError('Contiguous text is not available for stream buffers.')
+
+    def cursor(self,line=0,char=0):
+        cur = StreamCursor( self, line, char )
+        self._cur[id(cur)] = cur
+        return cur
+
+# ------------------------------------------------------------------------
+
+class TextBuffer(_Buffer):
+    """
+    Buffer instance from a single string.
+
+    The text is stored once, along with compact arrays describing each
+    line (see TextLines), and Line objects are only created on demand.
+    Lines are split after each '\n', and '\r\n' is kept as newline.
+    """
+    def __init__(self, text, r2l=False):
+        super().__init__()
+        logging.info('Initializing buffer from text.')
+
+        self._line = TextLines( text, RevLine.view if r2l else Line.view )
+        self._r2l = r2l
+        self._flat = not (r2l or self._line.crlf())
+
+        logging.info(f'Buffer initialized ({len(self)} lines).')
+
+    @property
+    def text(self): return self._line.text
+
+    @property
+    def fulltext(self):
+        return super().fulltext if self._r2l else self.text
+
+    @property
+    def nchars(self):
+        n = len(self._line)
+        return self._line.start(n-1) + self._line.length(n-1) if n > 0 else 0
+
+    @property
+    def lastpos(self):
+        n = len(self._line)
+        return (n-1, self._line.length(n-1)) if n > 0 else (0,0)
+
+    def _offset(self,pos):
+        return self._line.start(pos[0]) + pos[1]
+
+    def _offsets(self):
+        return self._line._off, 0
+    def _linelen(self,lnum):
+        return self._line.length(lnum)
+
+    def until(self,pos):
+        if self._r2l: return super().until(pos)
+        return self.text[ self._line.start(pos[0]):self._offset(pos) ]
+
+    def after(self,pos):
+        if self._r2l: return super().after(pos)
+        L = pos[0]
+        return self.text[ self._offset(pos):self._line.start(L) + self._line.length(L) ]
+
+    def lbetween(self,pos1,pos2):
+        if self._r2l: return super().lbetween(pos1,pos2)
+        (L1,C1), (L2,C2) = pos1, pos2
+        text, line = self.text, self._line
+        out = []
+        while L1 < L2:
+            b = line.start(L1)
+            out.append(text[ b+C1:b+line.length(L1) ])
+            L1 += 1
+            C1 = 0
+        b = line.start(L1)
+        out.append(text[ b+C1:b+max(C1,C2) ])
+        return out
+
+    def between(self,pos1,pos2,nl='\n'):
+        if self._flat and nl == '\n':
+            return self.text[ self._offset(pos1):self._offset(pos2) ]
+        else:
+            return nl.join(self.lbetween(pos1,pos2))
+
+    def distance(self,pos1,pos2):
+        return self._offset(pos2) - self._offset(pos1)
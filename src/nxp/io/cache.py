@@ -0,0 +1,112 @@
+
+import os
+import stat
+import os.path as op
+import logging
+from collections import OrderedDict
+
+# ------------------------------------------------------------------------
+
+class BufferCache:
+    """
+    Cache of buffer lines read from files, in order to skip reading and
+    segmentation of inputs that are processed repeatedly.
+
+    Entries are keyed on the real path of the file (and reading options), and
+    are only valid as long as the modification time and size of the file
+    are unchanged. The least recently used entries are evicted when the
+    (approximate) memory used exceeds 'maxsize' bytes.
+
+    The cache is disabled by default.
+    """
+    LINE_OVERHEAD = 128 # approximate memory used per Line object
+
+    def __init__(self, maxsize=256 << 20, enabled=False):
+        self._data = OrderedDict()
+        self._used = 0
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self): return len(self._data)
+
+    @property
+    def nbytes(self): return self._used
+
+    def enable(self,maxsize=None):
+        if maxsize is not None: self.maxsize = maxsize
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self.clear()
+
+    def clear(self):
+        self._data.clear()
+        self._used = 0
+        return self
+
+    # ----------  =====  ----------
+
+    @staticmethod
+    def key(filename,*opt):
+        """
+        Cache key for the current state of input file, with given options
+        (e.g. r2l flag and encoding), or None if it is not a regular file 
+        (e.g. a pipe), in which case it is never cached.
+        """
+        st = os.stat(filename)
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return ( op.realpath(filename), *opt, st.st_mtime_ns, st.st_size )
+
+    def get(self,key):
+        """
+        Return cached lines for given key, or None.
+        """
+        if not self.enabled or key is None: return None
+        entry = self._data.get(key[:-2])
+        if entry is None or entry[0] != key[-2:]:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._data.move_to_end(key[:-2])
+        logging.info(f'[BufferCache] Hit: "{key[0]}"')
+        return entry[1]
+
+    def put(self,key,lines):
+        """
+        Store lines for given key, and evict least recently used entries.
+        Lines are shared between buffers, and should not be modified.
+        """
+        if not self.enabled or key is None: return
+        self._pop(key[:-2])
+
+        size = self.LINE_OVERHEAD * len(lines)
+        if lines:
+            last = lines[-1]
+            size += last.offset + len(last.raw) + len(last.nl)
+        if size > self.maxsize: return
+
+        self._data[key[:-2]] = ( key[-2:], lines, size )
+        self._used += size
+        while self._used > self.maxsize:
+            self._pop(next(iter(self._data)))
+
+    def _pop(self,k):
+        entry = self._data.pop(k,None)
+        if entry is not None:
+            self._used -= entry[2]
+
+# ------------------------------------------------------------------------
+
+"""
+This is the buffer cache used by FileBuffer (and therefore by helpers
+like parsefile or procfile, and by Transform.include). It can be enabled
+with:
+    nxp.io.cache.Cache.enable( maxsize=1 << 30 )
+"""
+Cache = BufferCache()
@@ -2,6 +2,8 @@
 import re
 from .util import clamp
 import logging
+from nxp import trace
+from nxp.error import WindowError
 
 # ------------------------------------------------------------------------
 
@@ -10,12 +12,16 @@ class Cursor:
     Cursor objects act as "pointers" to buffer contents.
     Properties:
     - reference to the corresponding buffer, 
-    - line/char position.
+    - line/char position,
+    - optional packrat memo for token matches (see expr.memo),
+    - lazy flag, for tokens to create LazyMatch objects (see expr.match).
     """
-    __slots__ = ('_buf','_line','_char')
+    __slots__ = ('_buf','_line','_char','memo','lazy','__weakref__')
 
     def __init__(self, buf, line, char=0):
         self._buf = buf
+        self.memo = None
+        self.lazy = False
         self.setpos(line,char)
 
     def reset(self):
@@ -27,10 +33,12 @@ class Cursor:
     # "real" positions
     def linepos(self): return self._char
     def filepos(self): return self._char + self._line.offset
+    def bytepos(self): return self._buf.byteoffset(self.pos)
 
     # WARNING!
     # filepos returns a character count which excludes newline characters,
-    # this cannot be used with fseek or similar methods!
+    # this cannot be used with fseek or similar methods! Use bytepos instead
+    # with file buffers (see Buffer.byteoffset).
 
     # change line or cursor position
     @property 
@@ -42,16 +50,31 @@ class Cursor:
     @property 
     def char(self): return self._char
 
+    def peek(self):
+        """
+        Character at the cursor position, or None at the end of the line.
+        """
+        raw = self._line.raw
+        return raw[self._char] if self._char < len(raw) else None
+
     @property 
     def pos(self): return self.lnum, self._char
     @pos.setter
     def pos(self,p):
         self.setpos(p[0],p[1])
 
+    # checkpoints for backtracking: restore does not validate the mark,
+    # which should be obtained from the same cursor (except with stream
+    # buffers, see StreamCursor)
+    def mark(self): return self._line, self._char
+    def restore(self,m):
+        self._line, self._char = m
+        return self
+
     def setpos(self, line, char=0):
         self._line = self._buf[line]
         self._char = clamp( char, 0, len(self._line) )
-        logging.debug(f'[cursor] Set position to: L={self.lnum}, C={self.char}')
+        if trace.on: trace.emit( 'cursor.setpos', line=self._line.lnum, char=self._char )
         return self
 
     def nextchar(self, n=1):
@@ -61,10 +84,10 @@ class Cursor:
     def nextline(self, n=1):
         L = self.lnum
         if L+n < len(self._buf):
-            logging.debug(f'[cursor] Skip {n} line(s).')
+            if trace.on: trace.emit( 'cursor.nextline', n=n )
             return self.setpos(max( L+n, 0 ))
         else:
-            logging.debug(f'[cursor] Cannot skip {n} line(s): go to EOF.')
+            if trace.on: trace.emit( 'cursor.nextline', n=n, eof=True )
             return self.goto_eof()
 
     # disallow deep copies of cursors
@@ -73,7 +96,7 @@ class Cursor:
         self._line = other._line 
         self._char = other._char 
     def __copy__(self):
-        return Cursor( self._buf, self.lnum, self._char )
+        return self._buf.cursor( self.lnum, self._char )
     def __deepcopy__(self,memo):
         raise NotImplementedError('Cursors cannot be deep-copied.')
 
@@ -139,15 +162,31 @@ class Cursor:
         return self
 
     # match text contents (expects compiled regex)
-    def match(self,pat):
+    #
+    # With multi=True, the pattern is matched against the contiguous text
+    # of the buffer (see Buffer.fulltext) at offset filepos, and can span
+    # multiple lines; the match positions are offsets in that text.
+    def _subject(self,multi):
+        if multi:
+            return self._buf.fulltext, self.filepos()
+        else:
+            return self._line.raw, self._char
+
+    def match(self,pat,multi=False):
         if isinstance(pat,str): pat = re.compile(pat)
-        logging.debug(f'[cursor] Match pattern: {pat.pattern}')
-        return pat.match( self._line.raw, self._char )
+        if trace.on: trace.emit( 'cursor.match', pattern=pat.pattern, pos=self.pos, multi=multi )
+        return pat.match( *self._subject(multi) )
 
-    def search(self,pat):
+    def search(self,pat,multi=False):
         if isinstance(pat,str): pat = re.compile(pat)
-        logging.debug(f'[cursor] Search pattern: {pat.pattern}')
-        return pat.search( self._line.raw, self._char )
+        if trace.on: trace.emit( 'cursor.search', pattern=pat.pattern, pos=self.pos, multi=multi )
+        return pat.search( *self._subject(multi) )
+
+    def setoffset(self,offset):
+        """
+        Move cursor to the position of offset (see filepos).
+        """
+        return self.setpos( *self._buf.pos_from_offset(offset) )
 
     # raise exceptions
     def show(self,width=13):
@@ -161,3 +200,20 @@ class Cursor:
 
         logging.error(f'[cursor] Error at L={self.lnum}, C={self.char}: {msg}')
         raise exc('\n'.join([ p, '\t'+s+'..', '\t'+x, msg ]))
+
+# ------------------------------------------------------------------------
+
+class StreamCursor(Cursor):
+    """
+    Cursor of a stream buffer, whose lines before the retained window are
+    dropped (see StreamBuffer). Marks obtained before lines were dropped
+    are checked on restore, and raise WindowError like setpos.
+    """
+    __slots__ = ()
+
+    def restore(self,m):
+        first = self._buf._line.first
+        if m[0].lnum < first:
+            raise WindowError(f'Line {m[0].lnum} was dropped from the stream buffer (first retained line: {first}).')
+        self._line, self._char = m
+        return self
@@ -0,0 +1,376 @@
+
+"""
+Line indices are list-like sequences of Line objects, which only store
+compact offset arrays, and create Line objects on demand.
+"""
+
+import os
+import json
+import mmap
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, chain, islice
+from collections import OrderedDict
+from nxp.error import WindowError
+from .util import segment
+from .line import Line
+
+# ------------------------------------------------------------------------
+
+def _cumsum(lens,start=0):
+    """
+    Offsets of consecutive segments with given lengths, starting at 'start'.
+    """
+    return array( 'q', accumulate(chain([start],lens)) )
+
+def index_bytes(data, encoding='utf-8', chunk=1 << 22):
+    """
+    Compute the byte and character offsets of each line in input bytes
+    (split after each b'\\n'), followed by the total size as sentinel.
+    Input is processed in chunks, such that only the bytes (and decoded
+    strings, for non-ASCII chunks) of the lines in one chunk are created
+    at a time, and only the offsets are kept.
+    """
+    size = len(data)
+    boff = array('q')
+    coff = array('q')
+
+    # process chunks ending with a newline
+    bpos = cpos = 0
+    while bpos < size:
+        stop = data.find( b'\n', min(bpos + chunk, size) - 1 )
+        stop = size if stop < 0 else stop+1
+        block = data[bpos:stop]
+
+        # line lengths in bytes and characters
+        blen = [ len(s)+1 for s in block.split(b'\n') ]
+        if block.isascii():
+            clen = blen
+        else:
+            clen = [ len(s)+1 for s in block.decode(encoding).split('\n') ]
+
+        # the last item is the remainder after the last newline
+        n = len(blen) if stop == size and data[stop-1] != 10 else len(blen)-1
+        boff.extend(_cumsum( blen[:-1], bpos )[:n])
+        coff.extend(_cumsum( clen[:-1], cpos )[:n])
+        bpos = stop
+        cpos += sum(clen) - 1
+
+    # sentinels
+    boff.append(size)
+    coff.append(cpos)
+    return boff, coff
+
+# ------------------------------------------------------------------------
+
+class MappedLines:
+    """
+    Sequence of lines backed by a memory-mapped file.
+
+    Only the byte and character offsets of each line are computed upon
+    initialization (chunk by chunk, see index_bytes), and no per-line 
+    object is kept.
+    Line objects are created on first access, and the most recent ones
+    are kept in a bounded cache.
+
+    Lines are split on '\\n' only, which requires an ASCII-compatible
+    encoding (e.g. UTF-8 or Latin-1).
+    """
+    CHUNK = 1 << 22
+
+    def __init__(self, data, make, encoding='utf-8', cache=1024):
+        self._data = data
+        self._make = make
+        self._enc = encoding
+        self._cache = OrderedDict()
+        self._csize = cache
+        self._index()
+
+    def _index(self):
+        self._boff, self._coff = index_bytes( self._data, self._enc, self.CHUNK )
+
+    def __len__(self):
+        return len(self._boff) - 1
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __getitem__(self,key):
+        if isinstance(key,slice):
+            return [ self[k] for k in range(*key.indices(len(self))) ]
+
+        n = len(self)
+        if key < 0: key += n
+        if not 0 <= key < n:
+            raise IndexError('Line index out of range.')
+
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            return self._load(key)
+
+    def _load(self,k):
+        raw = self._data[ self._boff[k]:self._boff[k+1] ].decode(self._enc)
+        line = self._make( raw, k, self._coff[k] )
+
+        self._cache[k] = line
+        if len(self._cache) > self._csize:
+            self._cache.popitem(last=False)
+        return line
+
+    def close(self):
+        self._cache.clear()
+        if hasattr(self._data,'close'):
+            self._data.close()
+
+# ------------------------------------------------------------------------
+
+class StreamLines:
+    """
+    Sequence of lines read on demand from an iterable source.
+
+    Lines are read in chunks, and one line ahead of the last line accessed
+    (in order to detect the last line). Before each chunk is read, lines 
+    before index min(low(),k) - keep are dropped, where low is a callable
+    returning the lowest line index still in use, and k is the requested
+    index. Accessing a dropped line raises WindowError.
+    """
+    def __init__(self, src, make, low, chunk=1024, keep=0):
+        self._src = iter(src)
+        self._make = make
+        self._low = low
+        self._chunk = chunk
+        self._keep = keep
+
+        self._line = []
+        self._base = 0 # index of first retained line
+        self._off = 0 # offset of next line
+        self._eof = False
+
+    @property
+    def first(self): return self._base
+    @property
+    def eof(self): return self._eof
+
+    def __len__(self):
+        return self._base + len(self._line)
+    def __bool__(self):
+        return len(self) > 0 or self._fill(0)
+
+    def __iter__(self):
+        k = self._base
+        while self._fill(k):
+            yield self[k]
+            k += 1
+
+    def __getitem__(self,key):
+        if isinstance(key,slice):
+            if key.stop is None or key.stop < 0: self._fill()
+            return [ self[k] for k in range(*key.indices(len(self))) ]
+
+        if key < 0:
+            self._fill()
+            key += len(self)
+        else:
+            self._fill(key)
+
+        if key < self._base:
+            raise WindowError(f'Line {key} was dropped from the stream buffer (first retained line: {self._base}).')
+        try:
+            return self._line[ key - self._base ]
+        except IndexError:
+            raise IndexError('Line index out of range.')
+
+    def _fill(self,k=None):
+        """
+        Read chunks until line k+1 is available, or until the end of the 
+        stream if k is None. Return True if line k exists.
+        """
+        while not self._eof and (k is None or len(self) <= k+1):
+            self.drop( min(self._low(), len(self) if k is None else k) - self._keep )
+
+            block = list(islice( self._src, self._chunk ))
+            self._eof = len(block) < self._chunk
+            for line in block:
+                self._line.append(self._make( line, len(self), self._off ))
+                self._off += len(line)
+
+        return k is None or k < len(self)
+
+    def drop(self,lnum):
+        """
+        Drop all lines before lnum.
+        """
+        n = lnum - self._base
+        if n > 0:
+            del self._line[:n]
+            self._base += n
+
+# ------------------------------------------------------------------------
+
+class TextLines:
+    """
+    Sequence of lines backed by a single string.
+
+    The offset, beginning/end of text, and newline length of each line are
+    stored in parallel arrays, and Line objects are created on demand as 
+    views (see Line.view). The last line accessed is kept for reuse.
+    """
+    def __init__(self, text, view=Line.view):
+        self._text = text
+        self._mkview = view
+        self._off, self._bot, self._eot, self._nl = segment(text)
+        self._last = None
+
+    @property
+    def text(self): return self._text
+
+    def __len__(self):
+        return len(self._nl)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __getitem__(self,key):
+        if isinstance(key,slice):
+            return [ self[k] for k in range(*key.indices(len(self))) ]
+
+        n = len(self)
+        if key < 0: key += n
+        if not 0 <= key < n:
+            raise IndexError('Line index out of range.')
+
+        last = self._last
+        if last is None or last.lnum != key:
+            last = self._last = self._view(key)
+        return last
+
+    def _view(self,k):
+        b, e = self._off[k], self._off[k+1]
+        r = e - self._nl[k]
+        return self._mkview( self._text[b:r], self._text[r:e], 
+            self._bot[k], self._eot[k], k, b )
+
+    # ----------  =====  ----------
+    # Computations from offsets
+
+    def start(self,k): 
+        return self._off[k]
+    def length(self,k):
+        return self._off[k+1] - self._off[k] - self._nl[k]
+    def crlf(self):
+        return any( n == 2 for n in self._nl )
+
+# ------------------------------------------------------------------------
+
+class ByteIndex:
+    """
+    Byte and character offsets of each line of a file (see index_bytes), 
+    used to open a region of the file, or to convert positions to byte 
+    offsets (e.g. for tools that seek into the original file).
+
+    The index can be saved to a sidecar file, which is only loaded if the
+    modification time and size of the indexed file are unchanged.
+    """
+    MAGIC = b'NXPIDX1\n'
+    SUFFIX = '.nxpidx'
+
+    def __init__(self, boff, coff, encoding='utf-8', stamp=None):
+        self._boff = boff
+        self._coff = coff
+        self._enc = encoding
+        self._stamp = stamp
+
+    @property
+    def encoding(self): return self._enc
+    @property
+    def nbytes(self): return self._boff[-1]
+
+    def __len__(self):
+        return len(self._boff) - 1
+
+    @staticmethod
+    def _stamp_of(filename):
+        st = os.stat(filename)
+        return st.st_mtime_ns, st.st_size
+
+    @classmethod
+    def build(cls, filename, encoding='utf-8'):
+        stamp = cls._stamp_of(filename)
+        with open(filename,'rb') as fh:
+            try:
+                with mmap.mmap( fh.fileno(), 0, access=mmap.ACCESS_READ ) as data:
+                    boff, coff = index_bytes( data, encoding )
+            except ValueError: # empty file
+                boff, coff = index_bytes( b'', encoding )
+        return cls( boff, coff, encoding, stamp )
+
+    @classmethod
+    def open(cls, filename, encoding='utf-8', sidecar=None):
+        """
+        Load index from sidecar file if it is valid, otherwise build it and
+        save it to the sidecar file. If sidecar is True, the sidecar file is
+        the input filename with suffix '.nxpidx'. 
+        """
+        if not sidecar: 
+            return cls.build( filename, encoding )
+        if sidecar is True: 
+            sidecar = filename + cls.SUFFIX
+
+        try:
+            idx = cls.load(sidecar)
+            if idx._stamp == cls._stamp_of(filename) and idx._enc == encoding:
+                return idx
+        except (OSError, ValueError):
+            pass
+
+        idx = cls.build( filename, encoding )
+        idx.save(sidecar)
+        return idx
+
+    def save(self, path):
+        head = json.dumps({ 'stamp': self._stamp, 'encoding': self._enc, 'nlines': len(self) })
+        with open(path,'wb') as fh:
+            fh.write(self.MAGIC)
+            fh.write(head.encode() + b'\n')
+            self._boff.tofile(fh)
+            self._coff.tofile(fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path,'rb') as fh:
+            if fh.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f'Not an index file: "{path}"')
+            head = json.loads(fh.readline())
+            n = head['nlines'] + 1
+            boff = array('q'); boff.fromfile(fh,n)
+            coff = array('q'); coff.fromfile(fh,n)
+
+        stamp = head['stamp'] and tuple(head['stamp'])
+        return cls( boff, coff, head['encoding'], stamp )
+
+    # ----------  =====  ----------
+
+    def byterange(self, first=0, last=None):
+        """
+        Byte offsets of the region between lines first and last (excluded).
+        """
+        if last is None: last = len(self)
+        assert 0 <= first <= last <= len(self), IndexError(f'Bad line range: {first}-{last}')
+        return self._boff[first], self._boff[last]
+
+    def byteoffset(self, lnum, text=''):
+        """
+        Byte offset of text at the beginning of line lnum.
+        """
+        return self._boff[lnum] + len(text.encode(self._enc))
+
+    def lnum(self, byte):
+        """
+        Line containing input byte offset, in O(log n).
+        """
+        assert 0 <= byte <= self.nbytes, IndexError(f'Byte offset out of range: {byte}')
+        return min( bisect_right(self._boff,byte)-1, max(0,len(self)-1) )
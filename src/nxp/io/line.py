@@ -34,12 +34,27 @@ class Line:
         if _chkeol.fullmatch(self._nl) is None:
             raise ValueError('Bad end-of-line')
 
+    @classmethod
+    def view(cls, raw, nl, bot, eot, lnum=0, offset=0):
+        """
+        Create Line from a pre-computed segmentation (e.g. stored by buffer).
+        No validation is done in this case.
+        """
+        self = cls.__new__(cls)
+        self._raw = raw
+        self._nl = nl
+        self._bot = bot
+        self._eot = eot
+        self._num = lnum
+        self._off = offset
+        return self
+
     def __len__(self): return len(self._raw)
     def __str__(self): return self._raw
     def __repr__(self): return str({ 
         'num': self._num, 
         'off': self._off, 
-        'raw': self._raw, 
+        'raw': self.raw, 
         'nl': self._nl 
     })
 
@@ -87,4 +102,61 @@ class Line:
 
     def uses_lf(self): return self._nl == '\n'
     def uses_crlf(self): return self._nl == '\r\n'
-    
\ No newline at end of file
+    
+# ------------------------------------------------------------------------
+
+class RevLine(Line):
+    """
+    Right-to-left view of a line of text.
+
+    The original text is kept, and only reversed when the contents are
+    accessed (e.g. when matching). The segmentation is that of the 
+    reversed text, and the newline chars are not reversed.
+    """
+    __slots__ = ('_src',)
+
+    def __init__(self, line, lnum=0, offset=0):
+        super().__init__(line,lnum,offset)
+        self._src, self._raw = self._raw, None
+        self._bot, self._eot = self._flip(self._bot,self._eot)
+
+    def _flip(self,bot,eot):
+        n = len(self._src)
+        return n-eot, n-bot
+
+    @classmethod
+    def view(cls, raw, nl, bot, eot, lnum=0, offset=0):
+        """
+        Create RevLine from the segmentation of the original text.
+        """
+        self = cls.__new__(cls)
+        self._src = raw
+        self._raw = None
+        self._nl = nl
+        self._bot, self._eot = self._flip(bot,eot)
+        self._num = lnum
+        self._off = offset
+        return self
+
+    def __len__(self): return len(self._src)
+    def __str__(self): return self.raw
+
+    def __getitem__(self,key):
+        return self.raw[key]
+
+    @property
+    def source(self): return self._src
+    @property 
+    def raw(self): 
+        if self._raw is None:
+            self._raw = self._src[::-1]
+        return self._raw
+
+    @property 
+    def indent(self): return self.raw[0:self._bot]
+    @property 
+    def text(self): return self.raw[self._bot:self._eot]
+    @property 
+    def post(self): return self.raw[self._eot:]
+    @property 
+    def full(self): return self.raw + self._nl
@@ -0,0 +1,93 @@
+
+from functools import total_ordering
+
+"""
+A span refers to the text between two positions of a buffer, without
+copying it. The text is only extracted (once) when it is actually needed,
+e.g. when converting to str, comparing or concatenating.
+"""
+
+# ------------------------------------------------------------------------
+
+@total_ordering
+class Span:
+    """
+    Lazy text between positions beg and end of a buffer.
+
+    Spans behave like read-only strings: string methods are forwarded to
+    the underlying text, which is extracted and cached on first use.
+    Use str(span) to get the actual string (spans are not instances of 
+    str, e.g. for isinstance checks or json.dumps).
+    """
+    __slots__ = ('_buf','_beg','_end','_str')
+
+    def __init__(self,buf,beg,end):
+        self._buf = buf
+        self._beg = beg
+        self._end = end
+        self._str = None
+
+    @property
+    def buffer(self): return self._buf
+    @property
+    def beg(self): return self._beg
+    @property
+    def end(self): return self._end
+
+    def __str__(self):
+        if self._str is None:
+            self._str = self._buf.between( self._beg, self._end )
+        return self._str
+
+    def __repr__(self):
+        return repr(str(self))
+    def __format__(self,spec):
+        return format(str(self),spec)
+
+    def __len__(self):
+        # no need to extract text on a single line
+        if self._str is None and self._beg[0] == self._end[0]:
+            return max( 0, self._end[1] - self._beg[1] )
+        return len(str(self))
+    def __bool__(self):
+        return len(self) > 0
+
+    # comparison
+    def __eq__(self,other):
+        if isinstance(other,(str,Span)):
+            return str(self) == str(other)
+        return NotImplemented
+    def __lt__(self,other):
+        if isinstance(other,(str,Span)):
+            return str(self) < str(other)
+        return NotImplemented
+    def __hash__(self):
+        return hash(str(self))
+
+    # sequence
+    def __getitem__(self,key): return str(self)[key]
+    def __iter__(self): return iter(str(self))
+    def __contains__(self,s): return str(s) in str(self)
+
+    def __add__(self,other):
+        return str(self) + str(other) if isinstance(other,(str,Span)) else NotImplemented
+    def __radd__(self,other):
+        return str(other) + str(self) if isinstance(other,str) else NotImplemented
+    def __mul__(self,n): return str(self) * n
+    __rmul__ = __mul__
+
+    # conversion
+    def __int__(self): return int(str(self))
+    def __float__(self): return float(str(self))
+    def __fspath__(self): return str(self)
+
+    def __getattr__(self,name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr( str(self), name )
+
+    def __getstate__(self):
+        return str(self)
+    def __setstate__(self,state):
+        self._buf = self._beg = self._end = None
+        self._str = state
@@ -1,3 +1,8 @@
+from array import array
+from operator import getitem, add, sub
+from itertools import accumulate, chain, repeat
+from nxp.charset import white as _white
+import io, gzip, bz2, lzma
 
 def clamp(x,lo,up):
     """
@@ -27,3 +32,181 @@ def lstripn(text,chars):
     """
     strip = text.lstrip(chars)
     return len(text)-len(strip)
+
+# ------------------------------------------------------------------------
+
+# magic numbers of supported compression formats
+_magic = [
+    ( b'\x1f\x8b', lambda fh: gzip.GzipFile(fileobj=fh) ),
+    ( b'BZh', bz2.BZ2File ),
+    ( b'\xfd7zXZ\x00', lzma.LZMAFile )
+]
+
+def _decompressor(head):
+    """
+    Return the function wrapping a binary file object with the decompressor
+    of the format detected from its first bytes, or None if it is not 
+    compressed.
+    """
+    for magic, wrap in _magic:
+        if head.startswith(magic):
+            return wrap
+    return None
+
+class _TextFile(io.TextIOWrapper):
+    """
+    Text wrapper of a decompressed stream, which also closes the file.
+    """
+    def __init__(self,stream,fh,encoding):
+        super().__init__(stream,encoding=encoding)
+        self._fh = fh
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._fh.close()
+
+def is_compressed(filename):
+    with open(filename,'rb') as fh:
+        return _decompressor(fh.peek(6)[:6]) is not None
+
+def open_text(filename,encoding=None):
+    """
+    Open file for reading in text mode.
+    Files compressed with gzip, bz2 or xz are decompressed on-the-fly.
+
+    The file is opened once, and its first bytes are inspected without 
+    consuming them, such that pipes (e.g. /dev/stdin) can be read too.
+    """
+    fh = open(filename,'rb')
+    try:
+        wrap = _decompressor(fh.peek(6)[:6])
+        if wrap is None:
+            return io.TextIOWrapper(fh,encoding=encoding)
+        return _TextFile(wrap(fh),fh,encoding)
+    except:
+        fh.close()
+        raise
+
+# ------------------------------------------------------------------------
+
+"""
+Bulk segmentation of lines.
+
+The functions below compute the segmentation of many lines at once (see
+Line), by chaining built-in string methods with map, so that the loop over
+lines runs in C rather than in the interpreter. This still creates one
+string per line (the result of split), as well as temporary strings for
+the stripped lines; only TextLines and MappedLines avoid keeping a Line
+object per line. Outputs are lists, which are faster to build than arrays.
+"""
+
+_valid_eol = frozenset([ '', '\n', '\r\n' ])
+
+def blocks(chunks):
+    """
+    Regroup chunks of text into blocks ending with a newline (except 
+    possibly the last one).
+    """
+    rem = ''
+    for chunk in chunks:
+        k = chunk.rfind('\n') + 1
+        if k == 0:
+            rem += chunk
+        else:
+            yield rem + chunk[:k]
+            rem = chunk[k:]
+    if rem:
+        yield rem
+
+def splitlines(text):
+    """
+    Split text after each '\n' (unlike str.splitlines, which also splits
+    on other line boundaries).
+    """
+    lines = text.split('\n')
+    last = lines.pop()
+    lines = list(map( add, lines, repeat('\n') ))
+    if last: lines.append(last)
+    return lines
+
+def _strip_white(raw,rlen=None):
+    """
+    Beginning/end of text for each line (see Line).
+    """
+    if rlen is None: rlen = map(len,raw)
+    bot = list(map( sub, rlen, map(len, map(str.lstrip, raw, repeat(_white))) ))
+    eot = list(map( len, map(str.rstrip, raw, repeat(_white)) ))
+    return bot, eot
+
+def segment_lines(lines,nl=''):
+    """
+    Segment a list of strings, each corresponding to a line. 
+    The suffix nl is appended to the newline chars of each line, which is 
+    used for lines obtained by splitting text on '\n'.
+
+    Return four sequences with, for each line:
+        raw         line contents without newline
+        nl          newline chars
+        bot, eot    beginning/end of text
+    """
+    raw = list(map( str.rstrip, lines, repeat('\r\n') ))
+    rlen = list(map( len, raw ))
+    end = list(map( getitem, lines, map(slice, rlen, repeat(None)) ))
+    if nl: 
+        end = list(map( add, end, repeat(nl) ))
+    if not _valid_eol.issuperset(end):
+        raise ValueError('Bad end-of-line')
+
+    bot, eot = _strip_white(raw,rlen)
+    return raw, end, bot, eot
+
+def segment_text(text):
+    """
+    Split text after each '\n', and segment the corresponding lines.
+    Return the same outputs as segment_lines.
+    """
+    if '\r' in text:
+        return segment_lines(splitlines(text))
+
+    # without carriage returns, the raw contents are the split items
+    raw = text.split('\n')
+    last = raw.pop()
+    nl = list(repeat( '\n', len(raw) ))
+    if last: 
+        raw.append(last)
+        nl.append('')
+
+    bot, eot = _strip_white(raw)
+    return raw, nl, bot, eot
+
+def segment(text,chunk=1<<20):
+    """
+    Segment text into lines, split after each '\n'.
+    Return four arrays with, for each line:
+        offset      index of the first char in text
+        bot, eot    beginning/end of text (relative to offset)
+        nl          number of newline characters
+    The offset array contains an additional item equal to len(text).
+
+    The text is processed in blocks of approximately chunk chars, in 
+    order to bound the memory needed temporarily (by the strings created
+    for each line of a block, see segment_text).
+    """
+    off = array('q',[0])
+    bot = array('l')
+    eot = array('l')
+    nl = array('b')
+
+    b, n = 0, len(text)
+    while b < n:
+        e = text.find( '\n', min(b+chunk,n)-1 )
+        e = n if e < 0 else e+1
+        r, x, B, E = segment_text(text[b:e])
+        nl.extend(list(map( len, x )))
+        bot.extend(B)
+        eot.extend(E)
+        off.extend(list(accumulate(chain( [off.pop()], map(add, map(len,r), map(len,x)) ))))
+        b = e
+
+    return off, bot, eot, nl
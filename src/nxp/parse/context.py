@@ -1,15 +1,19 @@
 
 import logging
+from collections import deque
 from .match import RNode, RMatch
 from .rule import Scope
-from nxp.error import MatchError, PreCheckError, PostCheckError, ParseError
+from nxp.error import MatchError, CutError, PreCheckError, PostCheckError, ParseError
+from nxp import trace
 
 # ------------------------------------------------------------------------
 
 class Context:
     """
+    The history of rule matches can be bounded to the last N matches
+    with option history=N (e.g. to parse unbounded streams).
     """
-    def __init__(self,scope,event,start):
+    def __init__(self,scope,event,start,history=None):
         assert isinstance(scope,dict) and 'main' in scope, \
             TypeError('Input should be a dictionary with key "main".')
         assert all([ isinstance(s,Scope) for s in scope.values() ]), \
@@ -17,6 +21,7 @@ class Context:
 
         self._event = event
         self._scope = scope
+        self._maxh = history
         self._reset(start)
 
         # create dedicated channels
@@ -31,7 +36,8 @@ class Context:
 
     def _reset(self,start):
         self._node = RNode('main')
-        self._hist = []
+        self._hist = [] if self._maxh is None else deque(maxlen=self._maxh)
+        self._nmatch = 0
         self._last = None
         self.publish('reset')
         self.open(start)
@@ -66,23 +72,34 @@ class Context:
     def match(self,cur):
         scope = self.scope
         node = self._node 
-        pos = cur.pos 
-        logging.debug(f'[Context] Matching cursor at position: {pos}')
+        mk = cur.mark()
+        if trace.on: trace.emit( 'context.try', scope=node.name, pos=(mk[0].lnum, mk[1]) )
 
         # try to match a rule
         for idx,rule in enumerate(scope):
             try: 
-                # attempt to match current rule (throws if error)
-                m = rule.match(cur,self)
+                # attempt to match current rule (None if no match)
+                m = rule.attempt(cur,self)
+                if m is None:
+                    cur.restore(mk)
+                    continue
+
                 self._hist.append(m)
+                self._nmatch += 1
 
-                logging.info(f'[Context] Match #{len(self._hist)} (scope "{node.name}", ruleNum {idx}, ruleID {rule.id}).')
+                if trace.on: trace.emit( 'context.match', num=self._nmatch, scope=node.name, rnum=idx, rule=rule.id )
 
                 self.publish( 'match', match=m, scope=scope, rule=rule, rnum=idx )
 
                 return True
+            except CutError:
+                # committed expression failed, do not try other rules
+                if trace.on: trace.emit( 'context.cut', scope=node.name, rnum=idx, rule=rule.id )
+                cur.restore(mk)
+                break
             except (PreCheckError,MatchError,PostCheckError):
-                cur.pos = pos
+                # callbacks may still reject a match by raising
+                cur.restore(mk)
 
         # raise error if no rule was match in strict parsing
         if scope.strict:
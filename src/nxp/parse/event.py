@@ -1,5 +1,6 @@
 
 import logging
+from nxp import trace
 
 # ------------------------------------------------------------------------
 
@@ -44,7 +45,7 @@ class Channel:
         Iterate over subscribers, and call them with input args.
         """
         self._pubs += 1
-        logging.debug(f'[Channel:{self._name}] Publish (nsub={self.nsub}, npub={self.npub}).')
+        if trace.on: trace.emit( 'channel.publish', channel=self._name, nsub=len(self._subs), npub=self._pubs )
         for key,fun in self._subs.items():
             fun(*args, **kwargs)
 
@@ -1,5 +1,5 @@
 
-import logging
+from nxp import trace
 
 # ------------------------------------------------------------------------
 
@@ -12,17 +12,28 @@ class RMatch:
       * the corresponding text as a list of strings, each for a
         given repetition of the Token, which may be processed by
         callbacks in the Rule definition.
+
+    Unless processed, the text is only extracted from the match when used.
     """
-    __slots__ = ('rule','match','text')
+    __slots__ = ('rule','match','_text')
     
-    def __init__(self,r,m,t):
+    def __init__(self,r,m,t=None):
         self.rule = r 
-        self.text = t
+        self._text = t
         self.match = m
-        logging.debug(f'[RMatch] Initialized (Rule#{r._id}).')
+        if trace.on: trace.emit( 'rmatch.init', rule=r._id )
 
     def clone(self):
-        return RMatch( self.rule, self.match, self.text )
+        return RMatch( self.rule, self.match, self._text )
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = str(self.match.text)
+        return self._text
+    @text.setter
+    def text(self,val):
+        self._text = val
 
     @property
     def tag(self): return self.rule.tag
@@ -79,7 +90,7 @@ class RNode:
         except:
             self._depth = 0
 
-        logging.debug(f'[RNode] Initialized (scope "{name}").')
+        if trace.on: trace.emit( 'rnode.init', scope=name )
 
     @property
     def nchild(self): return sum([ isinstance(x,RNode) for x in self.data ])
@@ -153,7 +164,7 @@ class RNode:
     def add_match(self,match):
         assert isinstance(match,RMatch), TypeError(f'Unexpected type: {type(match)}')
         self.data.append(match)
-        logging.info(f'[RNode] Match #{len(self)} (scope "{self.name}", rule ID {match.rule._id}).')
+        if trace.on: trace.emit( 'rnode.match', scope=self.name, num=len(self), rule=match.rule._id )
         return match
 
     def add_child(self,name):
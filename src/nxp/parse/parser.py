@@ -1,6 +1,7 @@
 
 from .event import Hub
 from .context import Context
+from nxp.expr import Memo
 
 # ------------------------------------------------------------------------
 
@@ -32,12 +33,24 @@ class _Fuse:
 class Parser:
     """
     Implement matching logic between Cursor and Context.
+
+    With option memo=True (or a number of lines), token matches are cached
+    during each parse (see expr.memo); the statistics of the last parse
+    are available via parser.memo.
+
+    With option lazy=True, the text and regex data of token matches are 
+    only extracted when used (see expr.match.LazyMatch); this should not
+    be used with StreamBuffer, unless matches are only used in callbacks.
     """
-    __slots__ = ('_evt','_ctx','_chk')
-    def __init__( self, scope, start='main', finish=None ):
+    __slots__ = ('_evt','_ctx','_chk','_hist','_mopt','_memo','_lazy')
+    def __init__( self, scope, start='main', finish=None, history=None, memo=None, lazy=False ):
         self._evt = Hub()
-        self._ctx = Context( scope, self._evt, start )
+        self._ctx = Context( scope, self._evt, start, history )
         self._chk = (start,finish)
+        self._hist = history
+        self._mopt = memo
+        self._memo = None
+        self._lazy = lazy
 
     @property
     def context(self): return self._ctx
@@ -45,13 +58,22 @@ class Parser:
     def start(self): return self._chk[0]
     @property
     def finish(self): return self._chk[1]
+    @property
+    def memo(self): return self._memo
+    @property
+    def history(self): return self._hist
 
     def reset(self):
         self._ctx._reset(self.start)
         return self
 
-    def clone(self):
-        return Parser( self._ctx._scope, self.start, self.finish )
+    def clone(self,**kv):
+        """
+        Copy of the parser, with options overridden by keyword arguments.
+        """
+        opt = dict( start=self.start, finish=self.finish, history=self._hist, memo=self._mopt, lazy=self._lazy )
+        opt.update(kv)
+        return Parser( self._ctx._scope, **opt )
 
     # modify strictness
     def scope(self,name):
@@ -72,23 +94,41 @@ class Parser:
 
     # parsing
     def parse(self,cur):
+        """
+        Parse from the cursor position. The memo and lazy flag of the cursor
+        are only set if the corresponding options are, and restored on exit.
+        """
+        memo, lazy = cur.memo, cur.lazy
+
+        # packrat memo
+        if self._mopt is True:
+            self._memo = cur.memo = Memo()
+        elif self._mopt:
+            self._memo = cur.memo = Memo(self._mopt)
         
+        # lazy matches
+        if self._lazy:
+            cur.lazy = True
+
         # do the parsing
-        fuse = _Fuse(cur.pos)
-        while not cur.eof:
-            
-            if cur.bol: 
-                self._ctx.publish('bol',pos=cur.pos)
-            
-            if not self._ctx.match(cur):
-                cur.nextchar()
-
-            if cur.eol:
-                self._ctx.publish('eol',pos=cur.pos)
-                cur.nextline()
-            
-            if not fuse.update(cur.pos):
-                cur.error( f'Abort: cursor has remained at this position for too long (counter: {fuse.count}).' )
+        try:
+            fuse = _Fuse(cur.pos)
+            while not cur.eof:
+                
+                if cur.bol: 
+                    self._ctx.publish('bol',pos=cur.pos)
+                
+                if not self._ctx.match(cur):
+                    cur.nextchar()
+
+                if cur.eol:
+                    self._ctx.publish('eol',pos=cur.pos)
+                    cur.nextline()
+                
+                if not fuse.update(cur.pos):
+                    cur.error( f'Abort: cursor has remained at this position for too long (counter: {fuse.count}).' )
+        finally:
+            cur.memo, cur.lazy = memo, lazy
 
         # check finish context
         scope = self._ctx.scopename
@@ -3,7 +3,8 @@ import logging
 from itertools import count
 from .match import RMatch
 from nxp.expr import Token, TMatch, Regex
-from nxp.error import PreCheckError, PostCheckError
+from nxp.error import MatchError, PreCheckError, PostCheckError
+from nxp import trace
 
 # ------------------------------------------------------------------------
 
@@ -59,33 +60,58 @@ class Rule:
         return str(self._expr)
 
     def match(self,cur,ctx):
+        """
+        Returns RMatch in case of success, otherwise throws PreCheckError, 
+        MatchError or PostCheckError.
+        """
+        out = self._run(cur,ctx)
+        if isinstance(out,RMatch):
+            return out
+        raise out()
+
+    def attempt(self,cur,ctx):
+        """
+        Returns RMatch in case of success, None otherwise. 
+        CutError is raised if the expression fails after a cut (see Cut).
+        """
+        out = self._run(cur,ctx)
+        return out if isinstance(out,RMatch) else None
+
+    def _run(self,cur,ctx):
+        """
+        Returns RMatch in case of success, or the class of error otherwise.
+        """
 
         # check pre-conditions
         for cond in self._pre:
             if not cond(cur,ctx):
-                logging.debug(f'[Rule:{self.id}] Precondition failed.')
-                raise PreCheckError()
+                if trace.on: trace.emit( 'rule.pre', rule=self.id, ok=False )
+                return PreCheckError
 
-        # match pattern (raise error on fail)
+        # match pattern
         if self._expr is None:
             pos = cur.pos 
             match = TMatch(None,pos,pos)
         else:
-            match = self._expr.match(cur)
+            match = self._expr.attempt(cur)
+            if match is None:
+                return MatchError
 
         # check post-conditions
         for cond in self._post:
             if not cond(cur,ctx,match):
-                logging.debug(f'[Rule:{self.id}] Postcondition failed.')
-                raise PostCheckError()
+                if trace.on: trace.emit( 'rule.post', rule=self.id, ok=False )
+                return PostCheckError
 
         # notify
-        logging.debug(f'[Rule:{self.id}] Match: {match.beg} - {match.end}')
-
-        # process matched text sequentially
-        txt = match.text
-        for p in self._proc:
-            txt = p(txt)
+        if trace.on: trace.emit( 'rule.match', rule=self.id, beg=match.beg, end=match.end )
+
+        # process matched text sequentially (if any processing)
+        txt = None
+        if self._proc:
+            txt = str(match.text)
+            for p in self._proc:
+                txt = p(txt)
 
         # call functions
         out = RMatch(self,match,txt)
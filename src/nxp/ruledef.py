@@ -1,6 +1,7 @@
 
 from collections import defaultdict
 from nxp.parse import Rule, Validate, Process
+from nxp.expr import Token
 from nxp.error import ParseError
 
 # ------------------------------------------------------------------------
@@ -86,7 +87,9 @@ def _tag(kw,tag):
     _save(kw)
 
 def _pre(kw,fun,*args):
-    if callable(fun):
+    if isinstance(fun,Token): # e.g. lookahead And/Not
+        kw['pre'].append( lambda c,x: fun.test(c) )
+    elif callable(fun):
         kw['pre'].append( lambda c,x: fun(c,x,*args) )
     else:
         raise TypeError(f'Unexpected type: {type(fun)}')
@@ -95,7 +98,7 @@ def _post(kw,fun,*args):
     if callable(fun):
         kw['post'].append( lambda c,x,t: fun(c,x,t,*args) )
     elif isinstance(fun,str):
-        kw['post'].append( lambda c,x,t: Validate[fun](t.text,*args) )
+        kw['post'].append( lambda c,x,t: Validate[fun](str(t.text),*args) )
     else:
         raise TypeError(f'Unexpected type: {type(fun)}')
 
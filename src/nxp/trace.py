@@ -0,0 +1,87 @@
+
+import logging
+
+"""
+Project-wide trace switch.
+
+Hot paths (cursor moves, matches, events) only emit trace records when
+tracing is on, using:
+    if trace.on: trace.emit( 'cursor.setpos', line=L, char=C )
+so that with tracing off, there is no string formatting or logger lookup
+at all (only a boolean check).
+
+With tracing on, each record is an event name with a dictionary of data,
+which is passed to every sink (e.g. Recorder below), and logged at level
+DEBUG on the logger 'nxp.trace' (with fields 'event' and 'data').
+"""
+
+on = False
+_sinks = []
+_logger = logging.getLogger('nxp.trace')
+
+# ------------------------------------------------------------------------
+
+def enable(*sinks):
+    """
+    Turn tracing on, and add sinks, called as sink(event,data).
+    """
+    global on
+    _sinks.extend(sinks)
+    on = True
+
+def disable():
+    """
+    Turn tracing off, and remove all sinks.
+    """
+    global on
+    _sinks.clear()
+    on = False
+
+def remove(*sinks):
+    """
+    Remove sinks (if present), without changing the trace switch.
+    """
+    for sink in sinks:
+        if sink in _sinks:
+            _sinks.remove(sink)
+
+def emit(event, **data):
+    for sink in _sinks:
+        sink(event,data)
+    if _logger.isEnabledFor(logging.DEBUG):
+        _logger.debug( '[%s] %s', event, data, extra={ 'event': event, 'data': data } )
+
+# ------------------------------------------------------------------------
+
+class Recorder:
+    """
+    Sink storing trace records as (event,data) tuples.
+    It can be used as a context manager to trace a block of code:
+        with trace.Recorder() as rec:
+            ...
+        print(rec.count('rule.match'))
+
+    On exit, only this sink is removed, and tracing is switched back to
+    its previous state (other sinks are kept).
+    """
+    def __init__(self):
+        self.records = []
+        self._was = []
+
+    def __call__(self,event,data):
+        self.records.append(( event, data ))
+
+    def __enter__(self):
+        self._was.append(on)
+        enable(self)
+        return self
+    def __exit__(self,*args):
+        global on
+        remove(self)
+        on = self._was.pop()
+
+    def __len__(self): return len(self.records)
+    def __iter__(self): return iter(self.records)
+
+    def count(self,event):
+        return sum( 1 for e,_ in self.records if e == event )
@@ -0,0 +1,125 @@
+
+import os
+import os.path as op
+import tempfile
+import timeit
+import nxp
+from nxp import trace
+from nxp.error import MatchError
+from nxp.io.line import Line
+
+"""
+Benchmarks, run with:
+    python benchmark.py
+
+Timings are the best of several repeats, in milliseconds.
+"""
+
+# ------------------------------------------------------------------------
+
+TEST_FILE = op.join(op.dirname(__file__), 'text-kafka.txt')
+
+def best(fun, number=1, repeat=5):
+    return 1000 * min(timeit.repeat( fun, number=number, repeat=repeat )) / number
+
+def scaled_file(scale):
+    with open(TEST_FILE) as fh:
+        text = fh.read()
+    fd, path = tempfile.mkstemp( suffix='.txt' )
+    with os.fdopen(fd,'w') as fh:
+        fh.write( text * scale )
+    return path
+
+# ------------------------------------------------------------------------
+
+def bench_buffer(scale=2000):
+    """
+    Buffer construction: line-by-line segmentation vs. bulk segmentation.
+    """
+    path = scaled_file(scale)
+
+    def read():
+        with open(path) as fh:
+            return fh.read()
+
+    def perline():
+        out = []
+        offset = 0
+        with open(path) as fh:
+            for lnum,line in enumerate(fh):
+                out.append(Line(line,lnum,offset))
+                offset += len(line)
+        return out
+
+    print(f'Buffer construction ({scale} x {op.basename(TEST_FILE)}, {op.getsize(path)>>20} MB)')
+    print(f'\tread file only       {best(read):8.1f} ms')
+    print(f'\tper-line Line init   {best(perline):8.1f} ms')
+    print(f'\tFileBuffer (bulk)    {best(lambda: nxp.FileBuffer(path)):8.1f} ms')
+    print(f'\tFileBuffer (r2l)     {best(lambda: nxp.FileBuffer(path,r2l=True)):8.1f} ms')
+    print(f'\tTextBuffer (arrays)  {best(lambda: nxp.TextBuffer(read())):8.1f} ms')
+    print(f'\tMappedBuffer (index) {best(lambda: nxp.MappedBuffer(path).close()):8.1f} ms')
+
+    os.remove(path)
+
+def bench_trace(number=200000):
+    """
+    Cost per Regex.match with tracing off (default) and on.
+    """
+    cur = nxp.ListBuffer([ '  hello world 123\n' ] * 10).cursor(0,2)
+    tok = nxp.Regex( r'\w+' )
+    mk = cur.mark()
+
+    def run():
+        cur.restore(mk)
+        tok.match(cur)
+
+    print(f'Regex.match ({number} calls)')
+    print(f'\ttracing off          {1000*best(run,number):8.3f} us/call')
+    with trace.Recorder():
+        print(f'\ttracing on (record)  {1000*best(run,number):8.3f} us/call')
+
+def bench_fuse(number=20000):
+    """
+    Interpreted vs. fused expression (see nxp.fuse), on success and failure.
+    """
+    tok = nxp.XML_open()
+    fused = nxp.fuse(tok)
+    cur = nxp.ListBuffer([ '<a href="x" id=main class="c">\n', '<a href="x" id=main class="c"\n' ]).cursor()
+
+    def run(t,L):
+        def fun():
+            cur.setpos(L,0)
+            try: t.match(cur)
+            except MatchError: pass
+        return 1000*best(fun,number)
+
+    print(f'XML_open ({number} calls)')
+    print(f'\tinterpreted success   {run(tok,0):8.3f} us/call')
+    print(f'\tfused success         {run(fused,0):8.3f} us/call')
+    print(f'\tinterpreted failure   {run(tok,1):8.3f} us/call')
+    print(f'\tfused failure         {run(fused,1):8.3f} us/call')
+
+def bench_find(scale=20000):
+    """
+    Search for a sparse pattern with Token.find, compared to re.findall.
+    """
+    path = scaled_file(scale)
+    buf = nxp.FileBuffer(path)
+    text = buf.fulltext
+    tok = nxp.Regex(r'vermin\w*')
+    seq = nxp.Seq([ 'vermin', nxp.Opt(r'\w+') ])
+
+    print(f'Find "{tok}" ({scale} x {op.basename(TEST_FILE)}, {len(text)>>20} MB)')
+    print(f'\tre.findall           {best(lambda: tok._pat.findall(text)):8.1f} ms')
+    print(f'\tRegex.find           {best(lambda: list(tok.find(buf.cursor(),True))):8.1f} ms')
+    print(f'\tSeq.find             {best(lambda: list(seq.find(buf.cursor(),True))):8.1f} ms')
+
+    os.remove(path)
+
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    bench_buffer()
+    bench_trace()
+    bench_fuse()
+    bench_find()
@@ -1,7 +1,14 @@
 
+import os
 import os.path as op
+import gzip, lzma
+import tempfile
+import threading
 import unittest
-from nxp import FileBuffer, ListBuffer
+import nxp
+from nxp import FileBuffer, ListBuffer, MappedBuffer, StreamBuffer, TextBuffer
+from nxp.error import WindowError
+from nxp.io.cache import Cache
 
 # pylint: disable=no-member
 
@@ -22,6 +29,70 @@ class TestFileBuffer(unittest.TestCase):
         self.assertEqual( self.buf.nlines, TEST_FILE['nlines'], 'Problem with nlines' )
         self.assertEqual( self.buf.nchars, TEST_FILE['nchars'], 'Problem with nchars' )
 
+    def test_compressed(self):
+        with open(TEST_FILE['path']) as fh:
+            text = fh.read()
+        for fopen in [gzip.open, lzma.open]:
+            fd, path = tempfile.mkstemp()
+            os.close(fd)
+            with fopen(path,'wt') as fh:
+                fh.write(text)
+            buf = FileBuffer(path)
+            os.remove(path)
+            self.assertEqual( len(buf), TEST_FILE['nlines'] )
+            self.assertEqual( buf.nchars, TEST_FILE['nchars'] )
+
+    @unittest.skipUnless( hasattr(os,'mkfifo'), 'Named pipes are not supported' )
+    def test_fifo(self):
+        # the file is opened only once, such that pipes can be read
+        path = op.join( tempfile.mkdtemp(), 'fifo' )
+        os.mkfifo(path)
+        def write():
+            with open(path,'w') as fh:
+                fh.write('hello world\nsecond line\n')
+        writer = threading.Thread( target=write )
+        writer.start()
+        try:
+            buf = FileBuffer(path)
+            self.assertEqual( [ line.raw for line in buf ], ['hello world','second line'] )
+        finally:
+            writer.join()
+            os.remove(path)
+            os.rmdir(op.dirname(path))
+
+    def test_bytes(self):
+        text = 'Hé\r\n  wörld \nlast'
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd,'wb') as fh:
+            fh.write(text.encode('utf-8'))
+        try:
+            buf = FileBuffer(path, encoding='utf-8', index=True)
+            raw = text.encode('utf-8')
+            self.assertEqual( buf.cursor(1,3).bytepos(), raw.index('örld'.encode()) )
+            self.assertEqual( buf.byteoffset((2,0)), raw.index(b'last') )
+            self.assertTrue( op.isfile(path + '.nxpidx') )
+
+            # region from sidecar index
+            reg = FileBuffer(path, lines=(1,3), index=True, encoding='utf-8')
+            self.assertEqual( len(reg), 2 )
+            self.assertEqual( reg[0].text, 'wörld' )
+            self.assertEqual( reg.byteoffset((1,0)), raw.index(b'last') )
+            self.assertEqual( reg.byteindex().lnum(raw.index(b'last')), 2 )
+        finally:
+            os.remove(path)
+            os.remove(path + '.nxpidx')
+
+    def test_cache(self):
+        Cache.enable()
+        try:
+            a = FileBuffer(TEST_FILE['path'])
+            b = FileBuffer(TEST_FILE['path'])
+            self.assertIs( a._line, b._line )
+            self.assertEqual( Cache.hits, 1 )
+            self.assertIsNot( FileBuffer(TEST_FILE['path'],r2l=True)._line, a._line )
+        finally:
+            Cache.disable()
+
 class TestListBuffer(unittest.TestCase):
     def setUp(self):
         with open(TEST_FILE['path']) as fh:
@@ -32,6 +103,137 @@ class TestListBuffer(unittest.TestCase):
         self.assertEqual( self.buf.nlines, TEST_FILE['nlines'], 'Problem with nlines' )
         self.assertEqual( self.buf.nchars, TEST_FILE['nchars'], 'Problem with nchars' )
 
+    def test_span(self):
+        pos1, pos2 = (0,2), (1,3)
+        s = self.buf.span(pos1,pos2)
+        self.assertEqual( s, self.buf.between(pos1,pos2) )
+        self.assertEqual( len(s), len(str(s)) )
+        self.assertEqual( len(self.buf.span((0,2),(0,5))), 3 )
+        self.assertEqual( s.upper(), str(s).upper() )
+
+        # ordering is that of the text
+        t = str(s)
+        self.assertEqual( (s > 'a', s >= t, s <= t, s < t), (t > 'a', True, True, False) )
+        self.assertEqual( sorted([ s, 'z', 'A' ]), sorted([ t, 'z', 'A' ]) )
+        self.assertTrue( self.buf.span((0,0),(0,1)) <= s or s <= self.buf.span((0,0),(0,1)) )
+
+    def test_mark(self):
+        cur = self.buf.cursor(2,5)
+        mk = cur.mark()
+        cur.nextline(3).nextchar(4)
+        self.assertEqual( cur.restore(mk).pos, (2,5) )
+
+    def test_fulltext(self):
+        # lines without newline are not joined into a contiguous text
+        self.assertEqual( self.buf.fulltext[:10], self.buf[0].full[:10] )
+        buf = ListBuffer(['abc','def'])
+        self.assertRaises( NotImplementedError, lambda: buf.fulltext )
+        self.assertEqual( list(nxp.Regex('cd').find( buf.cursor(), True )), [] )
+        self.assertEqual( [ m.beg for m in nxp.Lit('d').find( buf.cursor(), True ) ], [(1,0)] )
+        self.assertEqual( ListBuffer(['abc\n','def']).fulltext, 'abc\ndef' )
+
+class TestMappedBuffer(unittest.TestCase):
+    def setUp(self):
+        self.buf = MappedBuffer(TEST_FILE['path'], cache=4)
+        self.ref = FileBuffer(TEST_FILE['path'])
+
+    def tearDown(self):
+        self.buf.close()
+
+    def test_properties(self):
+        self.assertEqual( len(self.buf), TEST_FILE['nlines'], 'Problem with __len__' )
+        self.assertEqual( self.buf.nlines, TEST_FILE['nlines'], 'Problem with nlines' )
+        self.assertEqual( self.buf.nchars, TEST_FILE['nchars'], 'Problem with nchars' )
+
+    def test_lines(self):
+        for a,b in zip(self.buf,self.ref):
+            self.assertEqual( (a.raw,a.nl,a.offset,a.bot,a.eot), (b.raw,b.nl,b.offset,b.bot,b.eot) )
+        self.assertEqual( self.buf[-1].lnum, TEST_FILE['nlines']-1 )
+        self.assertEqual( self.buf.cursor(3,5).pos, (3,5) )
+
+class TestTextBuffer(unittest.TestCase):
+    def setUp(self):
+        with open(TEST_FILE['path']) as fh:
+            self.buf = TextBuffer(fh.read())
+            fh.seek(0)
+            self.ref = ListBuffer(list(fh))
+
+    def test_properties(self):
+        self.assertEqual( len(self.buf), TEST_FILE['nlines'], 'Problem with __len__' )
+        self.assertEqual( self.buf.nlines, TEST_FILE['nlines'], 'Problem with nlines' )
+        self.assertEqual( self.buf.nchars, TEST_FILE['nchars'], 'Problem with nchars' )
+        self.assertEqual( self.buf.lastpos, self.ref.lastpos, 'Problem with lastpos' )
+
+    def test_positions(self):
+        for a,b in zip(self.buf,self.ref):
+            self.assertEqual( (a.raw,a.nl,a.offset,a.bot,a.eot), (b.raw,b.nl,b.offset,b.bot,b.eot) )
+        for p1,p2 in [ ((0,0),(0,5)), ((2,3),(7,0)), ((5,10),(5,10)), ((0,0),self.ref.lastpos) ]:
+            self.assertEqual( self.buf.between(p1,p2), self.ref.between(p1,p2) )
+            self.assertEqual( self.buf.distance(p1,p2), self.ref.distance(p1,p2) )
+
+    def test_offsets(self):
+        for off in [0, 1, 75, 76, 1000, TEST_FILE['nchars']]:
+            pos = self.ref.pos_from_offset(off)
+            self.assertEqual( self.buf.pos_from_offset(off), pos )
+            self.assertEqual( self.ref.cursor(*pos).filepos(), off )
+        self.assertEqual( self.buf.pos_from_offsets([0,1000]), self.ref.pos_from_offsets([0,1000]) )
+        self.assertEqual( self.buf.cursor_at_offset(76).pos, (1,0) )
+
+    def test_r2l(self):
+        buf = TextBuffer('ab  cd \n  xy\r\n\n   \nlast', r2l=True)
+        self.assertEqual( (buf[0].raw, buf[0].bot, buf[0].eot), (' dc  ba', 1, 7) )
+        self.assertEqual( (buf[1].text, buf[1].nl), ('yx', '\r\n') )
+        self.assertEqual( (buf[3].bot, buf[3].eot), (3,0) )
+        self.assertEqual( buf.until((0,4)), ' dc ' )
+        self.assertEqual( buf.between((0,1),(1,2)), 'dc  ba\nyx' )
+
+    def test_crlf(self):
+        buf = TextBuffer('Hello\r\n  world \n')
+        self.assertEqual( buf[0].nl, '\r\n' )
+        self.assertEqual( buf[1].text, 'world' )
+        self.assertEqual( buf.between((0,2),(1,4)), 'llo\n  wo' )
+
+class TestStreamBuffer(unittest.TestCase):
+    def setUp(self):
+        self.fh = open(TEST_FILE['path'])
+        self.buf = StreamBuffer(self.fh, chunk=4, keep=2)
+
+    def tearDown(self):
+        self.fh.close()
+
+    def test_properties(self):
+        self.assertEqual( self.buf.nchars, TEST_FILE['nchars'], 'Problem with nchars' )
+        self.assertEqual( self.buf.nlines, TEST_FILE['nlines'], 'Problem with nlines' )
+
+    def test_window(self):
+        cur = self.buf.cursor()
+        mk = cur.mark()
+        cur.setpos(20)
+        cur.setpos(30)
+        self.assertEqual( cur.setpos(18).lnum, 18 )
+        self.assertRaises( WindowError, cur.setpos, 10 )
+
+        # marks from before lines were dropped cannot be restored either
+        self.assertEqual( cur.restore(cur.setpos(28).mark()).lnum, 28 )
+        self.assertRaises( WindowError, cur.restore, mk )
+
+    def test_history(self):
+        # streaming helpers bound the history of rule matches
+        size = []
+        lang = { 'lang': { 'main': [ [ r'\w+', ('call', lambda c,x,m: size.append(len(x.history))) ] ] } }
+        nxp.parsestream( lang, self.fh, history=5 )
+        self.assertEqual( max(size), 5 )
+
+        self.fh.seek(0)
+        size.clear()
+        nxp.parsestream( nxp.make_parser(lang), self.fh )
+        self.assertEqual( max(size), nxp.STREAM_HISTORY )
+
+    def test_eof(self):
+        cur = self.buf.cursor()
+        while not cur.eof: cur.nextline()
+        self.assertEqual( cur.lnum, TEST_FILE['nlines']-1 )
+
 # ------------------------------------------------------------------------
 
 if __name__ == '__main__':
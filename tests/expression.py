@@ -1,7 +1,11 @@
 
 import os.path as op
+import re
 import unittest
 import nxp
+from nxp import trace
+from nxp.error import MatchError, CutError
+from nxp.expr.match import LazyMatch
 
 # pylint: disable=no-member
 
@@ -30,6 +34,248 @@ class TestWord(unittest.TestCase):
         for w, m in zip( first_line, nxp.Word().finditer(self.buf.cursor()) ):
             self.assertEqual( w, self.buf.between(m.beg,m.end), 'Bad match' )
 
+class TestRegex(unittest.TestCase):
+    def test_multi(self):
+        text = 'before\n```py\nx = 1\r\n```\nafter\n'
+        fence = nxp.Regex( r'```(\w*)\n.*?\n```', re.S, multi=True )
+        for buf in [ nxp.ListBuffer(text.splitlines(True)), nxp.TextBuffer(text) ]:
+            cur = buf.cursor(1,0)
+            m = fence.match(cur)
+            self.assertEqual( (m.beg, m.end), ((1,0),(3,3)) )
+            self.assertEqual( m[1], 'py' )
+            self.assertEqual( cur.pos, (3,3) )
+            self.assertRaises( MatchError, fence.match, buf.cursor(0,0) )
+
+    def test_trace(self):
+        cur = nxp.ListBuffer(['hello world']).cursor()
+        with trace.Recorder() as rec:
+            nxp.Regex(r'\w+').match(cur)
+        self.assertFalse( trace.on )
+        self.assertEqual( rec.count('cursor.match'), 1 )
+        self.assertEqual( rec.records[0][1]['pos'], (0,0) )
+
+        # sinks and switch are restored on exit
+        outer = []
+        trace.enable( lambda e,d: outer.append(e) )
+        try:
+            with trace.Recorder() as rec:
+                nxp.Regex(r'\s+').match(cur)
+            self.assertTrue( trace.on )
+            nxp.Regex(r'\w+').match(cur)
+            self.assertEqual( (len(rec), outer.count('cursor.match')), (1,2) )
+        finally:
+            trace.disable()
+
+    def test_find(self):
+        text = 'a cat\n\nbat, cab\nx'
+        pos = lambda tok,multi: [ (m.beg,m.end) for m in nxp.find(tok,text,multi=multi) ]
+        for tok in [ nxp.Regex(r'[bc]at'), nxp.Seq([ nxp.Either('b','c'), 'at' ]) ]:
+            self.assertEqual( pos(tok,False), [((0,2),(0,5))] )
+            self.assertEqual( pos(tok,True), [((0,2),(0,5)), ((2,0),(2,3))] )
+
+        # empty matches are found once at each position
+        self.assertEqual( len(pos(nxp.Regex(r'\b'),False)), 4 )
+        self.assertEqual( pos(nxp.Regex(r'^$',re.M,multi=True),True), [((1,0),(1,0))] )
+
+        # matches start at the end of a line if the token can match empty
+        ends = [ (p,p) for p in [(0,5),(1,0),(2,8),(3,1)] ]
+        for tok in [ nxp.Regex(r'$'), nxp.Not(r'.'), nxp.Regex(r'(?m)$',multi=True) ]:
+            self.assertEqual( pos(tok,False), ends[:1] )
+            self.assertEqual( pos(tok,True), ends )
+        self.assertEqual( pos(nxp.Seq([ nxp.Opt('b'), nxp.Not(r'.') ]),True)[2:4], [((2,7),(2,8)), ((2,8),(2,8))] )
+        self.assertEqual( pos(nxp.Seq([ 'x', nxp.Not(r'.') ]),True), [((3,0),(3,1))] )
+
+    def test_attempt(self):
+        tok = nxp.Seq([ nxp.Rep('a','1+',sep=','), 'b' ])
+        cur = nxp.ListBuffer(['a,a,c']).cursor()
+        self.assertIsNone( tok.attempt(cur) )
+        self.assertEqual( cur.pos, (0,0) )
+        self.assertRaises( MatchError, tok.match, cur )
+        self.assertEqual( str(tok.attempt(nxp.ListBuffer(['a,ab']).cursor()).text), 'a,ab' )
+
+class TestCustom(unittest.TestCase):
+    def test_match(self):
+        # tokens which only overload match can be composed
+        class Digit(nxp.Token):
+            def __str__(self): return 'digit'
+            def match(self,cur):
+                if cur.eol or not cur.line.raw[cur.char].isdigit():
+                    raise MatchError()
+                p = cur.pos
+                cur.nextchar()
+                return nxp.TMatch( self, p, cur.pos, [], cur.line.raw[p[1]] )
+
+        tok = nxp.Seq([ nxp.Rep(Digit(),'1-3'), nxp.Opt(Digit()), 'x' ])
+        self.assertEqual( nxp.match( tok, '12x' ).end, (0,3) )
+        self.assertIsNone( tok.attempt(nxp.ListBuffer(['12']).cursor()) )
+
+        # nullability is unknown, so unbounded repetition is allowed
+        self.assertIsNone( Digit().nullable )
+        self.assertEqual( nxp.match( nxp.Few(Digit()), '123' ).end, (0,3) )
+        self.assertEqual( [ t.nullable for t in [nxp.Seq(['a',Digit()]), nxp.Seq([nxp.Opt('a'),Digit()]), nxp.Opt(Digit())] ], [False,None,True] )
+
+        # which stops when repeated matches are empty
+        class Empty(nxp.Token):
+            def __str__(self): return 'empty'
+            def match(self,cur): return nxp.TMatch( self, cur.pos, cur.pos, [], '' )
+        self.assertEqual( len(nxp.match( nxp.Any(Empty()), 'a' )), 1 )
+
+class TestMemo(unittest.TestCase):
+    def test_memo(self):
+        num = nxp.NumInt()
+        tok = nxp.Xor( nxp.Seq([num,'x']), nxp.Seq([num,'y']) )
+        cur = nxp.ListBuffer(['12y 3']).cursor()
+        cur.memo = memo = nxp.Memo()
+
+        m = tok.match(cur)
+        self.assertEqual( (m.end, str(m.text)), ((0,3), '12y') )
+        self.assertEqual( (memo.hits, memo.misses), (1,6) )
+
+        # failure is cached too
+        cur.setpos(0,4)
+        self.assertRaises( MatchError, tok.match, cur )
+        self.assertRaises( MatchError, tok.match, cur )
+        self.assertEqual( cur.pos, (0,4) )
+        self.assertEqual( memo.hits, 3 )
+
+    def test_parser(self):
+        # the cursor options are restored, even if parsing fails
+        p = nxp.make_parser({ 'lang': { 'main': [[ r'a' ]] }, 'strict': True, 'memo': True, 'lazy': True })
+        cur = nxp.ListBuffer(['aab']).cursor()
+        cur.memo = memo = nxp.Memo()
+        self.assertRaises( nxp.error.ParseError, p.parse, cur )
+        self.assertEqual( (cur.memo, cur.lazy), (memo, False) )
+        self.assertEqual( p.memo.misses, 3 )
+
+class TestSet(unittest.TestCase):
+    def test_paths(self):
+        # ordered choice, bitmask and token set
+        text = 'ba cab'
+        self.assertEqual( nxp.match( nxp.Xor('a','b'), text ).end, (0,1) )
+        self.assertEqual( nxp.match( nxp.Set(['a','b','c'], min=2), text ).end, (0,2) )
+        self.assertRaises( MatchError, nxp.match, nxp.Set(['a','b'], min=2), text[1:] )
+
+        tok = nxp.Set([ f'x{k}' for k in range(100) ] + ['b','a'], min=2)
+        self.assertEqual( str(nxp.match( tok, text ).text), 'ba' )
+
+class TestRep(unittest.TestCase):
+    def test_regex(self):
+        # repetitions of regex are scanned without the cursor
+        text = 'a, a,a ,a'
+        for mul, end in [ ('1+',(0,9)), ([1,(3,5)],(0,9)), ('2',(0,4)), (range(1,6,2),(0,6)) ]:
+            tok = nxp.Rep( 'a', mul, sep=r'\s*,\s*' )
+            ref = nxp.Rep( nxp.Seq(['a']), mul, sep=r'\s*,\s*' )
+            m, r = nxp.match( tok, text ), nxp.match( ref, text )
+            self.assertIsNotNone( tok._rx )
+            self.assertEqual( (m.end, len(m)), (end, len(r)) )
+            self.assertEqual( r.end, end )
+        self.assertRaises( MatchError, nxp.match, nxp.Rep('a',3,sep=','), 'a,a' )
+
+        # empty repetitions stop, even if the regex is not known to be nullable
+        tok = nxp.Rep( nxp.Regex(r'(a*)\1'), '0+' )
+        self.assertIsNone( tok.token.nullable )
+        m = nxp.match( tok, 'b' )
+        self.assertEqual( (m.end, len(m)), ((0,0), 1) )
+        self.assertEqual( nxp.match( nxp.Any(r'a?',sep=','), ',a,' ).end, (0,3) )
+
+        cur = nxp.ListBuffer([text]).cursor()
+        cur.lazy = True
+        m = nxp.Odd('a',sep=r'\s*,\s*').match(cur)
+        self.assertIsInstance( m, LazyMatch )
+        self.assertEqual( ([ c.beg for c in m ], cur.pos), ([(0,0),(0,3),(0,5)], (0,6)) )
+
+    def test_mul(self):
+        from nxp.expr.repeat import mulparse, mulseq
+        self.assertEqual( [ mulparse(m).best(6) for m in ['1-3,5+','7+',range(1,9,2),mulseq(0,4)] ], [6,None,5,4] )
+
+        # multiplicities are not modified by matching
+        tok = nxp.Odd(nxp.Seq(['a']))
+        for text, end in [ ('aaaa',(0,3)), ('a',(0,1)), ('aa',(0,1)) ]:
+            self.assertEqual( nxp.match( tok, text ).end, end )
+        self.assertEqual( list(zip( range(3), tok._mul )), [(0,(1,1)), (1,(3,3)), (2,(5,5))] )
+
+class TestCut(unittest.TestCase):
+    def test_cut(self):
+        tag = nxp.Seq([ '<', nxp.Cut(), r'\w+', '>' ])
+        tok = nxp.Xor( tag, '<' )
+        self.assertEqual( len(nxp.match( tok, '<a>' )[0]), 3 )
+        self.assertRaises( CutError, nxp.match, tok, '<!' )
+        self.assertEqual( [ m.beg for m in nxp.find( tag, '<! <a>' ) ], [(0,3)] )
+
+        # possessive repetition commits the sequence
+        tok = nxp.Seq([ nxp.Rep(r'\w','1+',possessive=True), ';' ])
+        self.assertRaises( CutError, tok.attempt, nxp.ListBuffer(['ab.']).cursor() )
+        self.assertIsNone( tok.attempt(nxp.ListBuffer(['.']).cursor()) )
+
+        # other rules are not tried after a cut
+        p = nxp.make_parser({ 'lang': { 'main': [ [tag, ('save',)], [r'<!', ('save',)] ] } })
+        self.assertEqual( [ str(m.text) for m in nxp.parsetext( p, '<a> <!-- x' ).data ], ['<a>'] )
+
+class TestLookahead(unittest.TestCase):
+    def test_lookahead(self):
+        kw = nxp.Seq([ 'if', nxp.Not(r'\w') ])
+        m = nxp.match( kw, 'if x' )
+        self.assertEqual( (m.end, len(m)), ((0,2), 1) )
+        self.assertRaises( MatchError, nxp.match, kw, 'iffy' )
+
+        cur = nxp.ListBuffer(['ab']).cursor()
+        self.assertTrue( nxp.And(nxp.Seq(['a','b'])).test(cur) and not nxp.Not('a').test(cur) )
+        self.assertEqual( (nxp.And('a').match(cur).end, cur.pos), ((0,0), (0,0)) )
+
+        # rule pre-condition
+        p = nxp.make_parser({ 'lang': { 'main': [ [r'\w+', ('check',nxp.Not(r'\w+\(')), ('save',)] ] } })
+        self.assertEqual( [ str(m.text) for m in nxp.parsetext( p, 'f(x) y' ).data ], ['x','y'] )
+
+class TestKeywords(unittest.TestCase):
+    def test_keywords(self):
+        words = [ 'in', 'int', 'if', 'for', 'while', 'def', 'del', 'class', 'is' ]
+        text = 'Integer'
+        self.assertEqual( str(nxp.match( nxp.Literals(*words), 'integer' ).text), 'int' )
+        self.assertEqual( str(nxp.match( nxp.Literals(*words, longest=False), 'integer' ).text), 'in' )
+        self.assertEqual( str(nxp.match( nxp.Literals(*words, case=False), text ).text), 'Int' )
+        self.assertRaises( MatchError, nxp.match, nxp.Literals(*words), text )
+
+        # promotion in OneOf, with the same result
+        tok = nxp.OneOf(*[ nxp.Lit(w,case=False) for w in words ])
+        m = nxp.match( tok, text )
+        self.assertIsNotNone( tok._kw )
+        self.assertIs( m[0].tok, tok[0] )
+        self.assertEqual( m.end, (0,2) )
+
+class TestLazy(unittest.TestCase):
+    def test_lazy(self):
+        tok = nxp.Seq([ nxp.Regex(r'(\w+)=(\d+)'), nxp.Opt(r'\s*;') ])
+        cur = nxp.ListBuffer(['a=1; b']).cursor()
+        cur.lazy = True
+
+        m = tok.match(cur)
+        self.assertIsInstance( m, LazyMatch )
+        self.assertTrue( m[0].isregex() and not m.isregex() )
+        self.assertEqual( (m[0][2], len(m[0]), str(m.text)), ('1', 2, 'a=1;') )
+        self.assertEqual( m.captures(), {} )
+
+class TestAnalysis(unittest.TestCase):
+    def test_first(self):
+        self.assertEqual( nxp.Regex(r'(?i)k|[0-2]').first, set('kK\u212a012') )
+        self.assertEqual( nxp.Seq([ nxp.Opt('a'), 'b' ]).first, {'a','b'} )
+        self.assertIsNone( nxp.Word().first )
+        self.assertTrue( nxp.Set(['a','b'], min=0).nullable )
+        self.assertFalse( nxp.Seq([ 'a', 'b' ], skip=[0,1]).nullable )
+
+        tok = nxp.Seq([ 'a' ])
+        self.assertFalse( tok.excludes('a') or tok.nullable )
+        tok.prepend(nxp.Opt('b'))
+        self.assertEqual( tok.first, {'a','b'} )
+
+    def test_rep(self):
+        self.assertRaises( AssertionError, nxp.Any, r'\s*' )
+        self.assertRaises( AssertionError, nxp.Many, nxp.Opt('a'), sep=r'\s*' )
+        self.assertEqual( nxp.match( nxp.Rep(nxp.Opt('a'),'1+',sep=','), 'a,,a' ).end, (0,4) )
+
+        # empty items followed by a separator are not repeated indefinitely
+        self.assertEqual( nxp.match( nxp.Rep(nxp.Opt('a'),'2+',sep=','), ',a' ).end, (0,2) )
+        self.assertEqual( len(nxp.match( nxp.Any(nxp.Opt('a'),sep=','), ',a,a' )), 3 )
+
 # ------------------------------------------------------------------------
 
 if __name__ == '__main__':
@@ -0,0 +1,108 @@
+
+import random
+import unittest
+import nxp
+from nxp.expr.fuse import fuse, Fused, ENABLED
+from nxp.error import MatchError
+
+# pylint: disable=no-member
+
+"""
+Differential tests: fused expressions should match exactly like the
+original (interpreted) expressions.
+"""
+
+# ------------------------------------------------------------------------
+
+def _tree(m,key=id):
+    """
+    Comparable representation of a match tree, with tokens identified by
+    key (partially fused tokens are copies, compared with key=str).
+    """
+    if m.isregex():
+        data = (m.data.group(0), m.data.groups())
+    else:
+        data = [ _tree(x,key) for x in m.data ]
+    return (key(m.tok), m.name, m.beg, m.end, str(m.text), data)
+
+def _run(tok,text,char,lazy=False,key=id):
+    cur = nxp.ListBuffer([text]).cursor(0,char)
+    cur.lazy = lazy
+    try:
+        return _tree(tok.match(cur),key), cur.pos
+    except MatchError:
+        return None, cur.pos
+
+def _grammars():
+    a, b, w = nxp.Lit('a'), nxp.Lit('b+'), nxp.Regex(r'\s*')
+    num = nxp.Regex(r'\d+').save('num')
+    key = nxp.Regex(r'(A|a)b?', case=False)
+    return [
+        nxp.Seq([ a, b, a ]),
+        nxp.Seq([ a, b, num ], skip=[1]),
+        nxp.Seq([ a, nxp.Opt(b), a ]),
+        nxp.Either( nxp.Seq([a,b]), a, num ),
+        nxp.Set( [key, num], min=0, max=1 ),
+        nxp.Any( nxp.Either(a,b) ),
+        nxp.Rep( a, '2-3' ),
+        nxp.Rep( a, '1-2,4-5' ),
+        nxp.Rep( a, '0,2' ),
+        nxp.Rep( nxp.Either(key,num), '1+', sep=r'\s*,\s*' ),
+        nxp.Rep( key, '2-3,5+', sep=w ),
+        nxp.Seq([ nxp.Any(a), a ]), # no backtracking into Any
+        nxp.Seq([ key, nxp.Seq([ w, nxp.Few(num,sep=',') ]).save('list') ], skip=[1]),
+        nxp.Bool(),
+        nxp.Num(),
+        nxp.XML_open()
+    ]
+
+def _partial():
+    # repetitions of nullable items are not fused, but their children are
+    a, b = nxp.Lit('a'), nxp.Lit('b')
+    return [
+        nxp.Rep( nxp.Opt(a), '2+', sep=',' ),
+        nxp.Any( nxp.Seq([ nxp.Opt(a), b ], skip=[1]), sep=r'\s*,' ),
+        nxp.Rep( nxp.Rep( nxp.Few(b), [(0,0),(2,2)] ), '1+', sep=',' ),
+        nxp.Seq([ a, nxp.Few( nxp.Set([a,b], min=0, max=1), sep=',' ) ])
+    ]
+
+# ------------------------------------------------------------------------
+
+@unittest.skipUnless( ENABLED, 'Fusion requires Python 3.11+' )
+class TestFuse(unittest.TestCase):
+    def test_fused(self):
+        for tok in _grammars():
+            self.assertIsInstance( fuse(tok), Fused, str(tok) )
+
+    def test_partial(self):
+        tok = nxp.Seq([ nxp.Set(['a','b'], min=2), nxp.Seq(['c','d']) ])
+        out = fuse(tok)
+        self.assertIsInstance( out[1], Fused )
+        self.assertIsNot( out, tok )
+        self.assertNotIsInstance( tok[1], Fused )
+
+    def test_nullable(self):
+        for tok in _partial():
+            self.assertNotIsInstance( fuse(tok), Fused, str(tok) )
+        self.assertIsInstance( fuse(_partial()[2]).token, Fused )
+
+    def test_random(self):
+        rng = random.Random(0)
+        chars = 'aAbB1, =<>x"'
+        texts = [ 'ab', 'aab', 'aaaa', 'a, 1,2', 'True', '0x1f', '-1.5', '<a b="c">' ]
+        texts += [ ',a', ',c', 'a,,b', ',a,a', 'bb,b,bb', 'a,a b' ]
+        texts += [ ''.join(rng.choice(chars) for _ in range(rng.randint(0,12))) for _ in range(300) ]
+
+        cases = [ (t,id) for t in _grammars() ] + [ (t,str) for t in _partial() ]
+        for tok, key in cases:
+            fused = fuse(tok)
+            for text in texts:
+                for char in range(min(3,len(text)+1)):
+                    ref = _run(tok,text,char,key=key)
+                    self.assertEqual( _run(fused,text,char,key=key), ref, f'{tok} on "{text}" at {char}' )
+                    self.assertEqual( _run(fused,text,char,True,key), ref, f'{tok} on "{text}" at {char} (lazy)' )
+
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    unittest.main()